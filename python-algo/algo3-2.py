@@ -2,7 +2,6 @@ import gamelib
 import random
 import math
 import warnings
-import copy
 from sys import maxsize
 import json
 from gamelib import GameMap, GameState
@@ -24,6 +23,8 @@ Advanced strategy tips:
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
+        # on_action_frame only reads the breach events, so only those are decoded
+        self.subscribe_action_frames("events.breach")
         seed = random.randrange(maxsize)
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
@@ -66,7 +67,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        game_state = gamelib.GameFrame.of(turn_state, self.config).game_state
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
@@ -295,8 +296,8 @@ class AlgoStrategy(gamelib.AlgoCore):
             weight_turret = 0
             weight_turretPlus = 0
             for j in range(len(self.sectors[i])):
-                if game_state.contains_stationary_unit(self.sectors[i][j]):
-                    unit: gamelib.GameUnit = game_state.contains_stationary_unit(self.sectors[i][j])
+                unit: gamelib.GameUnit = game_state.contains_stationary_unit(self.sectors[i][j])
+                if unit:
                     weight = unit.health / unit.max_health
                     
                     if unit.unit_type == WALL:
@@ -437,12 +438,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
-        location_options = []
-        for i in range(14):
-            if game_state.can_spawn(SCOUT, [i,13-i]):
-                location_options.append([i,13-i])
-            if game_state.can_spawn(SCOUT, [14+i,i]):
-                location_options.append([14+i,i])
+        location_options = game_state.can_spawn_many(SCOUT, [location for i in range(14) for location in ([i,13-i], [14+i,i])])
 
         for location in location_options:
             path = game_state.find_path_to_edge(location)
@@ -471,21 +467,17 @@ class AlgoStrategy(gamelib.AlgoCore):
         # 6 stores set of all attackers along this path
         path_dmg: list[tuple[int,int,list[int]]]= []
         
-        location_options = []
         # game_state.get_target(attacking_unit)
-        for i in range(14):
-            if game_state.can_spawn(SCOUT, [i,13-i]):
-                location_options.append([i,13-i])
-            if game_state.can_spawn(SCOUT, [14+i,i]):
-                location_options.append([14+i,i])
+        location_options = game_state.can_spawn_many(SCOUT, [location for i in range(14) for location in ([i,13-i], [14+i,i])])
                 
         
-        TEMP_SCOUT  = gamelib.GameUnit(SCOUT, game_state.config)
+        # Our scout, so get_target skips our own structures
+        TEMP_SCOUT  = gamelib.GameUnit(SCOUT, game_state.config, 0)
         SCOUT_DAMAGE = TEMP_SCOUT.damage_f
         SCOUT_HP = TEMP_SCOUT.max_health
         
         for location in location_options:
-            temp_state :gamelib.GameState = copy.deepcopy(game_state)
+            temp_state :gamelib.GameState = game_state.fork()
             dead_scouts = 0
             edge = temp_state.get_target_edge(location)
             path = temp_state.find_path_to_edge(location)
@@ -508,12 +500,14 @@ class AlgoStrategy(gamelib.AlgoCore):
                 path_location = path[path_index]
                 attackers : list[gamelib.GameUnit] = temp_state.get_attackers(path_location, 0, dead_attackers)
                 
-                temp_state.game_map.add_unit(SCOUT, path_location)
+                # The scouts only need a unit to target from, so one unit is moved along the path
+                # instead of adding a scout to the map and removing it again at every location
+                TEMP_SCOUT.x, TEMP_SCOUT.y = path_location
                 
                 remaining_scouts_to_attack = num_scouts - dead_scouts
                 
                 while (remaining_scouts_to_attack > 0):
-                    target = temp_state.get_target(temp_state.game_map[path_location][0])
+                    target = temp_state.get_target(TEMP_SCOUT)
                     if target:
                         max_dmg = remaining_scouts_to_attack * SCOUT_DAMAGE
                         if target.health <= max_dmg:
@@ -543,8 +537,7 @@ class AlgoStrategy(gamelib.AlgoCore):
                             break
                     else: 
                         break
-                
-                temp_state.game_map.remove_unit(path_location)
+
                 
                 
                 
@@ -595,13 +588,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         # 0 stores turret damage to scout, 1 stores scout damage to turret, 2 stores the starting location
         path_dmg: list[tuple[int,int,list[int]]]= []
         
-        location_options = []
         # game_state.get_target(attacking_unit)
-        for i in range(14):
-            if game_state.can_spawn(SCOUT, [i,13-i]):
-                location_options.append([i,13-i])
-            if game_state.can_spawn(SCOUT, [14+i,i]):
-                location_options.append([14+i,i])
+        location_options = game_state.can_spawn_many(SCOUT, [location for i in range(14) for location in ([i,13-i], [14+i,i])])
         dead_scouts = 0
         for location in location_options:
             path = game_state.find_path_to_edge(location)
@@ -662,13 +650,10 @@ class AlgoStrategy(gamelib.AlgoCore):
                 break
         
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
-        total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
-        return total_units
+        # Only structures are counted, by a popcount of the enemy's bitboard over the region
+        game_map = game_state.game_map
+        region = None if valid_x is None and valid_y is None else game_map.region_bits(valid_x, valid_y)
+        return game_map.count_structures(1, unit_type, region)
         
     def filter_blocked_locations(self, locations, game_state):
         filtered = []
@@ -685,7 +670,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
+        state = gamelib.GameFrame.of(turn_string).data
         events = state["events"]
         breaches = events["breach"]
         for breach in breaches:
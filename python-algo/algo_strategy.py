@@ -21,8 +21,19 @@ Advanced strategy tips:
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
+    # Set above 1 to simulate attack candidates on that many processes at once
+    EVALUATION_PROCESSES = 0
+    # Share of the turn's remaining time full_sim may spend simulating attack candidates
+    SIMULATION_TIME_SHARE = 0.5
+
     def __init__(self):
         super().__init__()
+        self.evaluation_pool = gamelib.EvaluationPool(self.EVALUATION_PROCESSES)
+        # on_action_frame does nothing, so action frames are skipped. To use the breach example in it,
+        # call self.subscribe_action_frames("events.breach") instead.
+        self.ignore_action_frames()
+        # The game state our last turn left behind, used by precompute
+        self.last_game_state = None
         seed = random.randrange(maxsize)
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
@@ -32,7 +43,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         Read in config and perform any initial setup here 
         """
         # gamelib.debug_write('Configuring your custom algo strategy...')
-        self.config = config
+        super().on_game_start(config)
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, MP, SP
         WALL = config["unitInformation"][0]["shorthand"]
         SUPPORT = config["unitInformation"][1]["shorthand"]
@@ -53,6 +64,10 @@ class AlgoStrategy(gamelib.AlgoCore):
                 self.sectors[c // 7].append([c,r])
         
         self.start_points = [[4,12], [10,12], [17,12], [23,12]]
+
+        # Workers are forked now, while the algo is still small
+        if self.EVALUATION_PROCESSES > 1:
+            self.evaluation_pool.start(config)
         
         # gamelib.debug_write(str(self.sectors))
 
@@ -65,7 +80,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        game_state = gamelib.GameFrame.of(turn_state, self.config).game_state
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
@@ -74,6 +89,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.main_strategy(game_state)
 
         game_state.submit_turn()
+        self.last_game_state = game_state
         
         # gamelib.debug_write(self.parse_defenses(game_state))
         # if game_state.turn_number <= 8:
@@ -291,8 +307,8 @@ class AlgoStrategy(gamelib.AlgoCore):
             weight_turret = 0
             weight_turretPlus = 0
             for j in range(len(self.sectors[i])):
-                if game_state.contains_stationary_unit(self.sectors[i][j]):
-                    unit: gamelib.GameUnit = game_state.contains_stationary_unit(self.sectors[i][j])
+                unit: gamelib.GameUnit = game_state.contains_stationary_unit(self.sectors[i][j])
+                if unit:
                     weight = unit.health / unit.max_health
                     
                     if unit.unit_type == WALL:
@@ -411,12 +427,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         Build a line of the cheapest stationary unit so our demolisher can attack from long range.
         """
         # First let's figure out the cheapest unit
-        # We could just check the game rules, but this demonstrates how to use the GameUnit class
+        # The unit catalog holds the stats of every unit type, read once from the game rules
         stationary_units = [WALL, TURRET, SUPPORT]
         cheapest_unit = WALL
         for unit in stationary_units:
-            unit_class = gamelib.GameUnit(unit, game_state.config)
-            if unit_class.cost[game_state.MP] < gamelib.GameUnit(cheapest_unit, game_state.config).cost[game_state.MP]:
+            if self.unit_catalog.stats(unit).cost[game_state.MP] < self.unit_catalog.stats(cheapest_unit).cost[game_state.MP]:
                 cheapest_unit = unit
 
         # Now let's build out a line of stationary units. This will prevent our demolisher from running into the enemy base.
@@ -434,21 +449,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         It gets the path the unit will take then checks locations on that path to 
         estimate the path's damage risk.
         """
-        damages = []
-        location_options = []
-        for i in range(14):
-            if game_state.can_spawn(SCOUT, [i,13-i]):
-                location_options.append([i,13-i])
-            if game_state.can_spawn(SCOUT, [14+i,i]):
-                location_options.append([14+i,i])
+        location_options = game_state.can_spawn_many(SCOUT, [location for i in range(14) for location in ([i,13-i], [14+i,i])])
+
+        paths = game_state.find_paths_to_edge(location_options)
+        damages = gamelib.PathDamageEvaluator(game_state.threat_map, 0).total_damage(paths)
 
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
-            damage = 0
-            for path_location in path:
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
-            damages.append(damage)
-        
         min_damage = min(damages)
         indices = []
         for i,damage in enumerate(damages):
@@ -469,101 +474,29 @@ class AlgoStrategy(gamelib.AlgoCore):
         # 6 stores set of all attackers along this path
         path_dmg: list[tuple[int,int,list[int]]]= []
         
-        location_options = []
         # game_state.get_target(attacking_unit)
-        for i in range(14):
-            if game_state.can_spawn(SCOUT, [i,13-i]):
-                location_options.append([i,13-i])
-            if game_state.can_spawn(SCOUT, [14+i,i]):
-                location_options.append([14+i,i])
+        location_options = game_state.can_spawn_many(SCOUT, [location for i in range(14) for location in ([i,13-i], [14+i,i])])
                 
         
-        TEMP_SCOUT  = gamelib.GameUnit(SCOUT, game_state.config)
-        SCOUT_DAMAGE = TEMP_SCOUT.damage_f
-        SCOUT_HP = TEMP_SCOUT.max_health
-        
-        edge_locs = []
-        for i in range(4):
-            edge_locs.append(game_state.game_map.get_edge_locations(i))
-        
-        for location in location_options:
-            temp_state :gamelib.GameState = copy.deepcopy(game_state)
-            dead_scouts = 0
-            edge = temp_state.get_target_edge(location)
-            path = temp_state.find_path_to_edge(location)
-            scout_damage_to_turret = 0
-            scout_damage_to_wall = 0
-            scout_damage_to_support = 0
-            turret_damage_to_scout = 0
-            
-            all_attackers: set[tuple[int,int]] = set()
-            
-            path_index = 0
-            cur_hp = SCOUT_HP + 3 # hardcode + 3 for shield
-            
-            while path_index < len(path):
-                path_location = path[path_index]
-                attackers : list[gamelib.GameUnit] = temp_state.get_attackers(path_location, 0)
-                temp_state.game_map.add_unit(SCOUT, path_location)
-                
-                remaining_scouts_to_attack = num_scouts - dead_scouts
-                
-                while (remaining_scouts_to_attack > 0):
-                    target = temp_state.get_target_modified(temp_state.game_map[path_location][0])
-                    if target:
-                        max_dmg = remaining_scouts_to_attack * SCOUT_DAMAGE
-                        if target.health <= max_dmg:
-                            if target.unit_type == TURRET:
-                                scout_damage_to_turret += target.health
-                            elif target.unit_type == WALL:
-                                scout_damage_to_wall += target.health
-                            elif target.unit_type == SUPPORT:
-                                scout_damage_to_support += target.health
-                            
-                            temp_state.game_map.remove_unit([target.x, target.y])
-                            # after destroying a structure, recalculate the path
-                            path = temp_state.find_path_to_edge(path_location, edge)
-                            # gamelib.debug_write(str(path))
-                            path_index = 0
-                            
-                            remaining_scouts_to_attack -= math.ceil(target.health / SCOUT_DAMAGE)
-                        else:
-                            target.health -= max_dmg
-                            if target.unit_type == TURRET:
-                                scout_damage_to_turret += max_dmg
-                            elif target.unit_type == WALL:
-                                scout_damage_to_wall += max_dmg
-                            elif target.unit_type == SUPPORT:
-                                scout_damage_to_support += max_dmg
-                            break
-                    else: 
-                        break
-                
-                temp_state.game_map.remove_unit(path_location)
-                
-                
-                
-                # gamelib.debug_write(f"{location} path loc: {path_location} num attackers: {len(attackers)}")
-                
-                for attacker in attackers:
-                    all_attackers.add((attacker.x, attacker.y))
-                    if num_scouts == dead_scouts: 
-                        break
-                    turret_damage_to_scout += min(attacker.damage_i, cur_hp)
-                    cur_hp -= attacker.damage_i
-                    if cur_hp <= 0:
-                        dead_scouts += 1
-                        cur_hp = SCOUT_HP + 3
-                        # gamelib.debug_write("SCOUT DIED")
-                        
-                
-                path_index += 1
-            
-            survived = num_scouts-dead_scouts
-            if path[-1] not in edge_locs[edge]:
-                survived = 0
-            
-            path_dmg.append((survived, turret_damage_to_scout, scout_damage_to_turret, scout_damage_to_wall, scout_damage_to_support, location, all_attackers))
+        # Every candidate is simulated frame by frame on its own copy of the game state, on several processes if enabled.
+        # The least damaging paths are simulated first, so those are the ones simulated if the turn runs out of time
+        paths = game_state.find_paths_to_edge(location_options)
+        damages = gamelib.PathDamageEvaluator(game_state.threat_map, 0).total_damage(paths)
+        order = sorted(range(len(location_options)), key=lambda i: damages[i])
+        candidates = [[(SCOUT, location_options[i], num_scouts, 0)] for i in order]
+        timeout = self.turn_budget.remaining() * self.SIMULATION_TIME_SHARE
+        results = [None] * len(location_options)
+        for i, result in zip(order, self.evaluation_pool.evaluate(game_state, candidates, timeout)):
+            results[i] = result
+        for location, result in zip(location_options, results):
+            if result is None:
+                continue
+            scout_damage = result.damage_dealt[0]
+            turret_damage_to_scout = result.damage_dealt[1].get(SCOUT, 0)
+            path_dmg.append((result.breaches[0], turret_damage_to_scout, scout_damage.get(TURRET, 0), scout_damage.get(WALL, 0),
+                             scout_damage.get(SUPPORT, 0), location, result.attacking_structures[1]))
+        if not path_dmg:
+            return (self.least_damage_spawn_location(game_state), 0)
         # Python is a stable sort, so we sort by num surviving scouts, then by scout damage to supports, then by scout damage to turrets, then by scout damage to walls
         path_dmg = sorted(path_dmg, key = lambda x: x[3], reverse=True)
         path_dmg = sorted(path_dmg, key = lambda x: x[2], reverse=True)
@@ -578,7 +511,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         index = random.randrange(0,min(len(path_dmg),2)) # 0 or random
         
         best = path_dmg[0]
-        for i in range(1,8):
+        for i in range(1,min(8,len(path_dmg))):
             if len(set.intersection(best[6], path_dmg[i][6])) == 0 and best[0] - path_dmg[i][0] < math.ceil(num_scouts*0.2) and math.fabs(best[4]-path_dmg[i][4]) < 0.2 * best[4]:
                 return (path_dmg[i][5], path_dmg[i][0])
         
@@ -590,25 +523,22 @@ class AlgoStrategy(gamelib.AlgoCore):
         # 0 stores turret damage to scout, 1 stores scout damage to turret, 2 stores the starting location
         path_dmg: list[tuple[int,int,list[int]]]= []
         
-        location_options = []
         # game_state.get_target(attacking_unit)
-        for i in range(14):
-            if game_state.can_spawn(SCOUT, [i,13-i]):
-                location_options.append([i,13-i])
-            if game_state.can_spawn(SCOUT, [14+i,i]):
-                location_options.append([14+i,i])
+        location_options = game_state.can_spawn_many(SCOUT, [location for i in range(14) for location in ([i,13-i], [14+i,i])])
         dead_scouts = 0
+        turret_stats = self.unit_catalog.stats(TURRET)
+        scout_stats = self.unit_catalog.stats(SCOUT)
         for location in location_options:
             path = game_state.find_path_to_edge(location)
             scout_damage_to_turret = 0
             turret_damage_to_scout = 0
             dead_attackers: set[list[int,int]] = {}
             for path_location in path:
-                turret_damage_to_scout += len(game_state.get_attackers(path_location, 0, dead_attackers)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+                turret_damage_to_scout += len(game_state.get_attackers(path_location, 0, dead_attackers)) * turret_stats.damage_i
                 target = game_state.get_target(gamelib.GameUnit(SCOUT, game_state.config))
-                if target and target.unit_type == gamelib.GameUnit(TURRET, game_state.config).unit_type:
-                    scout_damage_to_turret += min(target.health, gamelib.GameUnit(SCOUT, game_state.config).damage_f *num_scouts)
-                    if gamelib.GameUnit(SCOUT, game_state.config).damage_i * num_scouts >= target.health:
+                if target and target.unit_type == TURRET:
+                    scout_damage_to_turret += min(target.health, scout_stats.damage_f *num_scouts)
+                    if scout_stats.damage_i * num_scouts >= target.health:
                        dead_attackers.add((target.x,target.y))
                 elif target and target.unit_type == gamelib.GameUnit(WALL,game_state.config):
                     scout_damage_to_wall += min(target.health,)
@@ -657,13 +587,10 @@ class AlgoStrategy(gamelib.AlgoCore):
                 break
         
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
-        total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
-        return total_units
+        # Only structures are counted, by a popcount of the enemy's bitboard over the region
+        game_map = game_state.game_map
+        region = None if valid_x is None and valid_y is None else game_map.region_bits(valid_x, valid_y)
+        return game_map.count_structures(1, unit_type, region)
         
     def filter_blocked_locations(self, locations, game_state):
         filtered = []
@@ -672,6 +599,27 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
+    def precompute(self, stop_event):
+        """
+        Runs on a background thread during the action phase. It finds the paths from our spawn locations
+        on the board as our last turn left it, so they are in the path cache next turn if the board has not changed.
+        """
+        if self.last_game_state is None:
+            return
+        game_state = self.last_game_state.fork()
+        game_map = game_state.game_map
+        # Structures pending removal are gone by the next turn
+        for x, y in game_map.arena_locations:
+            for unit in game_map._units_at(x, y):
+                if unit.stationary and unit.pending_removal:
+                    game_map.remove_unit([x, y])
+                    break
+        for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT):
+            if stop_event.is_set():
+                return
+            if not game_state.contains_stationary_unit(location):
+                game_state.find_path_to_edge(location)
+
     def on_action_frame(self, turn_string):
         """
         This is the action frame of the game. This function could be called 
@@ -680,7 +628,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        # state = json.loads(turn_string)
+        # state = gamelib.GameFrame.of(turn_string).data
         # events = state["events"]
         # breaches = events["breach"]
         # for breach in breaches:
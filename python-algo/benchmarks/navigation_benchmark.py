@@ -0,0 +1,68 @@
+"""
+Measures the bounds check of GameMap and the path-finder on random boards.
+
+Run from the python-algo folder: python benchmarks/navigation_benchmark.py [boards]
+
+Paths are found with a ShortestPathFinder that has no cache, so every search is run in full.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import gamelib
+from gamelib.navigation import ShortestPathFinder
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "game-configs.json")
+EMPTY_FRAME = json.dumps({"p1Units": [[] for _ in range(8)], "p2Units": [[] for _ in range(8)], "turnInfo": [0, 10, -1],
+                          "p1Stats": [30.0, 25.0, 10.0, 0], "p2Stats": [30.0, 25.0, 10.0, 0], "events": {}})
+
+
+def random_board(config, generator):
+    game_state = gamelib.GameState(config, EMPTY_FRAME)
+    game_state.suppress_warnings(True)
+    game_map = game_state.game_map
+    density = generator.choice([0.1, 0.25, 0.4])
+    for x in range(game_map.ARENA_SIZE):
+        for y in range(game_map.ARENA_SIZE):
+            if game_map.in_arena_bounds([x, y]) and generator.random() < density:
+                game_map.add_unit(generator.choice(["FF", "DF"]), [x, y], 0 if y < game_map.HALF_ARENA else 1)
+    return game_state
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with open(CONFIG_PATH) as config_file:
+        config = json.load(config_file)
+    generator = random.Random(0)
+    boards = [random_board(config, generator) for _ in range(count)]
+
+    game_map = boards[0].game_map
+    locations = [[x, y] for x in range(-1, game_map.ARENA_SIZE + 1) for y in range(-1, game_map.ARENA_SIZE + 1)]
+    start = time.perf_counter()
+    for _ in range(100):
+        for location in locations:
+            game_map.in_arena_bounds(location)
+    bounds_time = time.perf_counter() - start
+
+    searches = 0
+    start = time.perf_counter()
+    for game_state in boards:
+        finder = ShortestPathFinder(None)
+        game_map = game_state.game_map
+        for edge in [game_map.BOTTOM_LEFT, game_map.BOTTOM_RIGHT]:
+            end_points = game_map.get_edge_locations(game_state.get_target_edge(game_map.get_edge_locations(edge)[0]))
+            for start_point in game_map.get_edge_locations(edge):
+                if not game_state.contains_stationary_unit(start_point):
+                    finder.navigate_multiple_endpoints(start_point, end_points, game_state)
+                    searches += 1
+    search_time = time.perf_counter() - start
+
+    print("in_arena_bounds:             {:7.3f} us per call".format(1e6 * bounds_time / (100 * len(locations))))
+    print("navigate_multiple_endpoints: {:7.3f} ms per search ({} searches)".format(1000 * search_time / searches, searches))
+
+
+if __name__ == "__main__":
+    main()
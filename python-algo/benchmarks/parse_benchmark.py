@@ -0,0 +1,76 @@
+"""
+Measures how long it takes to parse a frame from the engine into a GameState.
+
+Run from the python-algo folder: python benchmarks/parse_benchmark.py [frames]
+
+The frames are random boards with a structure on about a third of each half and a few stacks of mobile units.
+Parsing only decodes the units into columns, the GameUnits of a location are built when it is first accessed,
+so the time to access every location is reported separately.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import gamelib
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "game-configs.json")
+
+
+def random_frame(config, generator):
+    game_map = gamelib.GameMap(config)
+    unit_lists = [[[] for _ in config["unitInformation"]] for _ in range(2)]
+    for x in range(game_map.ARENA_SIZE):
+        for y in range(game_map.ARENA_SIZE):
+            if not game_map.in_arena_bounds([x, y]):
+                continue
+            player_index = 0 if y < game_map.HALF_ARENA else 1
+            if generator.random() < 0.35:
+                type_index = generator.choice([0, 0, 1, 2, 2])
+                unit_lists[player_index][type_index].append([x, y, float(generator.randint(1, 75)), ""])
+                if generator.random() < 0.3:
+                    unit_lists[player_index][7].append([x, y, 0, ""])
+            elif generator.random() < 0.05:
+                for _ in range(generator.randint(1, 10)):
+                    unit_lists[player_index][generator.choice([3, 4, 5])].append([x, y, 15.0, ""])
+    stats = [30.0, 25.0, 10.0, 0]
+    return json.dumps({"p1Units": unit_lists[0], "p2Units": unit_lists[1], "turnInfo": [0, 10, -1],
+                       "p1Stats": stats, "p2Stats": stats, "events": {}})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with open(CONFIG_PATH) as config_file:
+        config = json.load(config_file)
+    generator = random.Random(0)
+    frames = [random_frame(config, generator) for _ in range(count)]
+    catalog = gamelib.UnitCatalog.for_config(config)
+    units = sum(len(gamelib.UnitColumns.from_frame(catalog, json.loads(frame))) for frame in frames)
+
+    start = time.perf_counter()
+    for frame in frames:
+        json.loads(frame)
+    decode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    states = [gamelib.GameState(config, frame) for frame in frames]
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for state in states:
+        for x in range(state.ARENA_SIZE):
+            for y in range(state.ARENA_SIZE):
+                if state.game_map.in_arena_bounds([x, y]):
+                    state.game_map[x, y]
+    access_time = time.perf_counter() - start
+
+    print("{} frames, {:.0f} units per frame".format(count, units / count))
+    print("json.loads:               {:7.3f} ms per frame".format(1000 * decode_time / count))
+    print("GameState:                {:7.3f} ms per frame".format(1000 * parse_time / count))
+    print("Accessing every location: {:7.3f} ms per frame".format(1000 * access_time / count))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,20 +10,47 @@ Investigating it is useful for any player that wants to access more information
 The GameUnit class in unit.py represents a single unit. 
 Investigating it is useful for any player that wants to access information about units. \n
 
+The UnitCatalog class in unit_catalog.py holds the stats of every unit type, read once from the game config. \n
+
+The UnitColumns class in unit_columns.py holds the units of a frame as arrays, which GameMap turns into GameUnits as locations are accessed. \n
+
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
 
 The Navigation class in navigation.py contains functions related to path-finding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The PathCache class in path_cache.py remembers paths found by the path-finder, keyed on the structure layout. \n
+
+The ThreatMap class in threat_map.py keeps track of the damage structures deal at every location, as the structures change. \n
+
+The PathDamageEvaluator class in path_damage.py scores many paths at once against a ThreatMap, using NumPy when it is installed. \n
+
+The ActionPhaseSimulator class in simulator.py simulates the action phase frame by frame, to predict the outcome of an attack. \n
+
+The EvaluationPool class in evaluation_pool.py runs those simulations on several processes at once. \n
+
+The BackgroundWorker class in background.py runs AlgoCore.precompute on a thread during the action phase. \n
+
+The TurnBudget class in turn_budget.py keeps track of how much of the turn's time is left, so searches can stop in time. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
 from .algocore import AlgoCore
 from .util import debug_write
-from .game_state import GameState
+from .game_state import GameState, GameFrame
 from .unit import GameUnit
+from .unit_catalog import UnitCatalog, UnitStats
+from .unit_columns import UnitColumns
 from .game_map import GameMap
-
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+from .path_cache import PathCache
+from .threat_map import ThreatMap
+from .path_damage import PathDamageEvaluator
+from .simulator import ActionPhaseSimulator, SimulationResult
+from .evaluation_pool import EvaluationPool
+from .turn_budget import TurnBudget
+from .background import BackgroundWorker
+
+__all__ = ["algocore", "background", "evaluation_pool", "game_state", "game_map", "navigation", "path_cache", "path_damage", "simulator", "threat_map", "turn_budget", "unit", "unit_catalog", "unit_columns", "util"]
  
\ No newline at end of file
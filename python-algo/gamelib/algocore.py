@@ -1,7 +1,10 @@
-import json
+import time
 
-from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .background import BackgroundWorker
+from .game_state import GameFrame
+from .turn_budget import TurnBudget
+from .unit_catalog import UnitCatalog
+from .util import get_command, debug_write, flush_debug, json_loads, BANNER_TEXT, send_command
 
 class AlgoCore(object):
     """
@@ -10,29 +13,42 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * unit_catalog (:obj: UnitCatalog): The stats of every unit type, built in on_game_start
+        * turn_budget (:obj: TurnBudget): How much of the current turn's time is left, started when a turn frame arrives
+        * action_frame_fields (tuple): The fields of action frames passed to on_action_frame, see subscribe_action_frames.
+          None to pass whole frames, an empty tuple to skip action frames.
+        * background_worker (:obj: BackgroundWorker): Runs precompute during the action phase
 
     """
     def __init__(self):
         self.config = None
+        self.unit_catalog = None
+        self.turn_budget = TurnBudget()
+        # Algos that do not handle action frames do not pay for decoding them
+        self.action_frame_fields = None if type(self).on_action_frame is not AlgoCore.on_action_frame else ()
+        self.background_worker = BackgroundWorker()
+        self.__precompute_started = False
 
     def on_game_start(self, config):
         """
         This function is called once at the start of the game. 
-        By default, it just initializes the config. \n
+        By default, it initializes the config and the unit catalog. \n
         You can override it it in algo_strategy.py to perform start of game setup
         """
         self.config = config
+        self.unit_catalog = UnitCatalog.for_config(config)
 
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
         It is passed the current game state, which can be used to initiate a new GameState object. 
+        The game state is a GameFrame: its decoded JSON is in .data and a GameState of it in .game_state,
+        so it does not need to be decoded again.
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
         """
-        send_command("[]")
-        send_command("[]")
+        send_command("[]", "[]")
     
     def on_action_frame(self, action_frame_game_state):
         """
@@ -40,9 +56,37 @@ class AlgoCore(object):
         The action phase is made up of a sequence of distinct frames. 
         Each of these frames is sent to the algo in order. 
         They can be handled in this function. 
+        Like in on_turn, each frame is a GameFrame that was only decoded once.
+        Use subscribe_action_frames to only decode the parts of the frames you need.
         """
         pass
 
+    def precompute(self, stop_event):
+        """
+        Called on a background thread at the first action frame of each turn, while the engine plays out the action phase.
+        It can be overridden to prepare the next turn from the last known board, for example by finding paths
+        so they are in the PathCache when the next turn starts. \n
+        It must return soon after stop_event is set, which happens when the next turn frame arrives.
+        on_turn and on_action_frame run on the main thread meanwhile, so only share thread safe data with them.
+        """
+        pass
+
+    def subscribe_action_frames(self, *fields):
+        """Chooses which fields of action frames are decoded and passed to on_action_frame.
+        Only those fields are decoded, see GameFrame.partial, so action phases cost little when few fields are used.
+
+        Args:
+            fields: The fields to decode, member names or dotted paths such as "events.breach".
+                    With no fields, whole frames are decoded.
+
+        """
+        self.action_frame_fields = fields or None
+
+    def ignore_action_frames(self):
+        """Stops calling on_action_frame. Action frames are then skipped without being decoded.
+        """
+        self.action_frame_fields = ()
+
 
     def start(self):
         """ 
@@ -57,31 +101,45 @@ class AlgoCore(object):
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
             game_state_string = get_command()
+            received_at = time.time()
             if "replaySave" in game_state_string:
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
-                parsed_config = json.loads(game_state_string)
+                parsed_config = json_loads(game_state_string)
+                self.turn_budget.configure(parsed_config)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                # Only turnInfo is decoded until it is known whether the frame is needed
+                stateType = int(GameFrame.scan(game_state_string, "turnInfo")["turnInfo"][0])
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    self.turn_budget.start(received_at)
+                    self.background_worker.stop()
+                    self.__precompute_started = False
+                    self.on_turn(GameFrame(game_state_string, self.config))
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    if not self.__precompute_started and type(self).precompute is not AlgoCore.precompute:
+                        self.__precompute_started = True
+                        self.background_worker.start(self.precompute)
+                    fields = self.action_frame_fields
+                    if fields is None:
+                        self.on_action_frame(GameFrame(game_state_string, self.config))
+                    elif fields:
+                        self.on_action_frame(GameFrame.partial(game_state_string, fields, self.config))
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
                     debug_write("Got end state, game over. Stopping algo.")
+                    self.background_worker.stop()
+                    flush_debug()
                     break
                 else:
                     """
@@ -93,3 +151,5 @@ class AlgoCore(object):
                 Something is wrong? Received an incorrect or improperly formatted string.
                 """
                 debug_write("Got unexpected string : {}".format(game_state_string))
+            # Debug output is written once per frame instead of once per message
+            flush_debug()
@@ -0,0 +1,74 @@
+import threading
+
+from .util import debug_write
+
+
+class BackgroundWorker:
+    """Runs a function on a thread while the algo would otherwise be waiting for the engine.
+
+    AlgoCore starts it with AlgoCore.precompute at the first action frame of a turn and stops it as soon as the
+    next turn frame arrives, so the time the engine spends on the action phase can be used to warm caches for the
+    next turn. Stopping is cooperative: the function is passed a threading.Event and must return soon after it is set.
+    A function that is still running after stop_timeout keeps the worker busy, and start does not run another one
+    until it has returned, so two functions never fill the caches at once.
+    Only caches that are safe to share between threads, such as the PathCache, should be filled from the thread.
+
+    Attributes :
+        * stop_timeout (float): The number of seconds stop waits for the function to return
+        * stop_event (threading.Event): Set when the function should return
+
+    """
+    def __init__(self, stop_timeout=0.1):
+        self.stop_timeout = stop_timeout
+        self.stop_event = threading.Event()
+        self.__thread = None
+
+    @property
+    def running(self):
+        """Whether the function is still running
+        """
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self, target, *args):
+        """Calls target(stop_event, *args) on a new thread, stopping the previous one first
+
+        Args:
+            target: The function to run
+            args: More arguments for the function
+
+        Returns:
+            True if the function was started, False if the previous one is still running
+
+        """
+        if not self.stop():
+            debug_write("The background worker is still busy, skipping this run")
+            return False
+        self.stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, args=(target, self.stop_event) + args, daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        """Asks the function to return and waits up to stop_timeout seconds for it
+
+        Returns:
+            True if the function is no longer running
+
+        """
+        if self.__thread is None:
+            return True
+        self.stop_event.set()
+        self.__thread.join(self.stop_timeout)
+        if self.__thread.is_alive():
+            debug_write("The background worker did not stop within {} seconds".format(self.stop_timeout))
+            return False
+        self.__thread = None
+        return True
+
+    @staticmethod
+    def __run(target, stop_event, *args):
+        try:
+            target(stop_event, *args)
+        except Exception as error:
+            # The worker only warms caches, so a failure must not take the algo down
+            debug_write("The background worker failed: {!r}".format(error))
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import pickle
+import time
+
+from .game_state import GameState
+from .simulator import ActionPhaseSimulator
+from .util import debug_write
+
+# The number of bytes of a pickled snapshot the shared payload can hold, larger snapshots are sent with each task
+PAYLOAD_SIZE = 1 << 20
+
+# The game state each worker process is evaluating candidates on
+_worker_config = None
+_worker_payload = None
+_worker_key = None
+_worker_simulator = None
+
+def _init_worker(config, payload):
+    global _worker_config, _worker_payload
+    _worker_config = config
+    _worker_payload = payload
+
+def _read_payload(key):
+    """Reads the snapshot of an evaluation from the shared payload, or None if it already holds a later one
+    """
+    lock, evaluation, length, data = _worker_payload
+    with lock:
+        if evaluation.value != key:
+            return None
+        return pickle.loads(data[:length.value])
+
+def _evaluate(task):
+    """Simulates a chunk of candidates in a worker process. Candidates reached after the deadline are skipped.
+    """
+    global _worker_key, _worker_simulator
+    key, pickled, candidates, deadline = task
+    if key != _worker_key:
+        snapshot = pickle.loads(pickled) if pickled is not None else _read_payload(key)
+        if snapshot is None:
+            # The evaluation this chunk belongs to has already returned
+            return [None] * len(candidates)
+        _worker_simulator = ActionPhaseSimulator(GameState.from_snapshot(_worker_config, snapshot))
+        _worker_key = key
+    results = []
+    for spawns in candidates:
+        results.append(None if deadline is not None and time.time() >= deadline else _worker_simulator.simulate(spawns))
+    return results
+
+
+class EvaluationPool:
+    """Simulates spawn candidates on several processes at once.
+
+    The worker processes are started once, usually in on_game_start. Every call to evaluate pickles a compact
+    snapshot of the game state once, see GameState.snapshot, and writes it to memory shared with the workers.
+    Each worker reads it and rebuilds the game state once per evaluation, the tasks only carry the candidates.
+    Candidates not finished by the deadline are left out of the results, so evaluate always returns in time.
+    If the pool was not started, candidates are simulated one after another in this process.
+
+    Attributes :
+        * processes (int): The number of worker processes
+        * started (bool): Whether the worker processes are running
+
+    """
+    def __init__(self, processes=None):
+        """
+        Args:
+            processes: The number of worker processes, by default one per CPU
+
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.started = False
+        self.__pool = None
+        self.__payload = None
+        self.__evaluations = 0
+
+    def start(self, config):
+        """Starts the worker processes. Forks them where possible, so they start instantly.
+
+        Args:
+            config: The game configuration
+
+        """
+        self.close()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        # The lock, evaluation number, length and bytes of the pickled snapshot being evaluated
+        self.__payload = (context.Lock(), context.RawValue('q', 0), context.RawValue('q', 0), context.RawArray('c', PAYLOAD_SIZE))
+        self.__pool = context.Pool(self.processes, initializer=_init_worker, initargs=(config, self.__payload))
+        self.started = True
+
+    def evaluate(self, game_state, candidates, timeout=None):
+        """Simulates every candidate on the game state, see ActionPhaseSimulator.simulate
+
+        Args:
+            game_state: The GameState to simulate on
+            candidates: A list of candidates, each a list of (unit_type, location, num, player_index) spawns
+            timeout: The number of seconds to wait for results, or None to wait for every candidate
+
+        Returns:
+            A list with the SimulationResult of each candidate, in order, or None for candidates that were not
+            simulated before the timeout
+
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        results = []
+        if self.started:
+            self.__evaluations += 1
+            key = self.__evaluations
+            pickled = pickle.dumps(game_state.snapshot(), pickle.HIGHEST_PROTOCOL)
+            if len(pickled) <= PAYLOAD_SIZE:
+                lock, evaluation, length, data = self.__payload
+                with lock:
+                    data[:len(pickled)] = pickled
+                    length.value = len(pickled)
+                    evaluation.value = key
+                pickled = None
+            # Two chunks per worker keeps the workers busy without paying for a message per candidate
+            size = max(1, -(-len(candidates) // (2 * self.processes)))
+            chunks = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+            pending = [self.__pool.apply_async(_evaluate, ((key, pickled, chunk, deadline),)) for chunk in chunks]
+            for chunk, result in zip(chunks, pending):
+                remaining = None if deadline is None else max(deadline - time.time(), 0)
+                try:
+                    results.extend(result.get(remaining))
+                except multiprocessing.TimeoutError:
+                    results.extend([None] * len(chunk))
+        else:
+            simulator = ActionPhaseSimulator(game_state)
+            for spawns in candidates:
+                results.append(None if deadline is not None and time.time() >= deadline else simulator.simulate(spawns))
+
+        missing = results.count(None)
+        if missing:
+            debug_write("Ran out of time, {} of {} candidates were not simulated".format(missing, len(candidates)))
+        return results
+
+    def close(self):
+        """Stops the worker processes
+        """
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
+        self.started = False
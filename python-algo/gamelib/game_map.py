@@ -1,7 +1,43 @@
+import copy
 import math
-import sys
+import random
 from .unit import GameUnit
-from .util import debug_write
+from .unit_catalog import UnitCatalog
+from .unit_columns import PENDING_REMOVAL, UPGRADED
+from .util import debug_write, debug_write_raw, WARNING
+
+_ZOBRIST_KEYS = {}
+_ARENA_TABLES = {}
+_LOCATION_TABLES = {}
+_EDGE_TABLES = {}
+_RANGE_OFFSETS = {}
+_REGION_BITS = {}
+
+# The number of set bits of a bitboard
+_popcount = int.bit_count if hasattr(int, "bit_count") else lambda bits: bin(bits).count("1")
+
+def _zobrist_keys(count):
+    """Random 64 bit keys used to hash structure layouts, generated once and shared by every GameMap.
+    The seed is fixed so hashes are the same in every process.
+    """
+    keys = _ZOBRIST_KEYS.get(count)
+    if keys is None:
+        generator = random.Random(0x5EED)
+        keys = [generator.getrandbits(64) for _ in range(count)]
+        _ZOBRIST_KEYS[count] = keys
+    return keys
+
+def _range_offsets(radius, hit_radius):
+    """The (dx, dy) offsets of every location within radius + hit_radius of a location, sorted by dx then dy.
+    Computed once per radius and shared by every GameMap.
+    """
+    offsets = _RANGE_OFFSETS.get((radius, hit_radius))
+    if offsets is None:
+        search_radius = math.ceil(radius)
+        offsets = tuple((dx, dy) for dx in range(-search_radius, search_radius + 1) for dy in range(-search_radius, search_radius + 1)
+                        if math.sqrt(dx ** 2 + dy ** 2) < radius + hit_radius)
+        _RANGE_OFFSETS[(radius, hit_radius)] = offsets
+    return offsets
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -10,6 +46,14 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    The units of a parsed frame are kept in a UnitColumns, and the GameUnits of a location are only
+    built the first time game_map[x, y] is used on it.
+
+    Identical mobile units added with add_unit are kept as one [unit_type, player_index, count, health] stack,
+    so a simulation can add, count and remove a group of thirty scouts as a single record. game_map[x, y]
+    turns the stacks of a location into GameUnits, after which they are ordinary units of that location.
+    get_stacks, count_units and remove_units give the same answers before and after that happens.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
@@ -19,6 +63,13 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * arena_locations (tuple): Every location in the arena bounds as an (x, y) tuple, ordered by row then column.
+          Iterating over the map yields the same locations as [x, y] lists.
+        * zobrist_hash (int): A 64 bit hash of the structures on the map, built from their location, type, owner and upgrade.
+          It is updated in constant time as structures are added, removed or upgraded, so two maps with the
+          same structures have the same hash no matter how they were built.
+        * structure_bits (int): A bitboard of the locations holding a structure, bit x * ARENA_SIZE + y is set if [x, y] does.
+          See bitboard for the structures of one player or type.
 
     """
     def __init__(self, config):
@@ -37,24 +88,212 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__shared_tiles = None
+        self.__columns = None
+        # Mobile units added with add_unit are kept as [unit_type, player_index, count, health] stacks per index
+        # until their location is accessed, see __expand_stacks
+        self.__stacks = {}
+        self._structure_listeners = []
+        self._type_index = {unit["shorthand"]: i for i, unit in enumerate(config["unitInformation"]) if "shorthand" in unit}
+        # Only the size is kept on the map, so copying the map does not copy the shared keys
+        self._zobrist_size = self.ARENA_SIZE * self.ARENA_SIZE * len(config["unitInformation"]) * 4
+        _zobrist_keys(self._zobrist_size)
+        self.zobrist_hash = 0
+        self.structure_bits = 0
+        # _bitboards[player_index][type_index] is a bitboard of the structures of that player and type
+        self._bitboards = [[0] * len(config["unitInformation"]), [0] * len(config["unitInformation"])]
+        self._hit_radius = config["unitInformation"][0]['getHitRadius']
+        self._arena_mask, self._arena_indices, self._neighbors, self._arena_locations = self.__build_arena_tables()
+        self.arena_locations, self.__halves, self.__quadrants = self.__build_location_tables()
+        self.__edges, self.__edge_sets, self.__edge_bits = self.__build_edge_tables()
+        # Mobile units are deployed from the two bottom edges
+        self._spawn_edges = self.__edge_sets[self.BOTTOM_LEFT] | self.__edge_sets[self.BOTTOM_RIGHT]
+        for unit in config["unitInformation"]:
+            for stats in [unit, unit.get("upgrade", {})]:
+                for key in ["attackRange", "shieldRange", "selfDestructRange"]:
+                    if key in stats:
+                        _range_offsets(stats[key], self._hit_radius)
     
+    # Tables built once per arena size and shared by every GameMap, copy.deepcopy shares them instead of copying them
+    _SHARED_TABLES = frozenset(["_arena_mask", "_arena_indices", "_neighbors", "_arena_locations",
+                                "arena_locations", "_GameMap__halves", "_GameMap__quadrants",
+                                "_GameMap__edges", "_GameMap__edge_sets", "_GameMap__edge_bits", "_spawn_edges"])
+
+    def __deepcopy__(self, memo):
+        copied = GameMap.__new__(GameMap)
+        memo[id(self)] = copied
+        for name, value in self.__dict__.items():
+            if name != "_structure_listeners":
+                copied.__dict__[name] = value if name in self._SHARED_TABLES else copy.deepcopy(value, memo)
+        # The listeners belong to the original's ThreatMap and path-finder, the copy's are registered by GameState
+        copied._structure_listeners = []
+        return copied
+
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x,y = location
-            return self.__map[x][y]
+            return self.__own_tile(x, y)
         self._invalid_coordinates(location)
 
+    def fork(self):
+        """Makes a copy of this map that can be changed without affecting the original.
+
+        The copy shares the config and the lists of units with this map. A location's units are only copied
+        the first time that location is accessed or changed on either map, so forking is cheap and
+        only the locations that are actually used are ever copied.
+
+        Returns:
+            A new GameMap with the same units as this one
+
+        """
+        forked = copy.copy(self)
+        forked.__map = [column[:] for column in self.__map]
+        forked.__stacks = {index: [stack[:] for stack in stacks] for index, stacks in self.__stacks.items()}
+        forked._bitboards = [list(bitboards) for bitboards in self._bitboards]
+        forked._structure_listeners = []
+        self.__shared_tiles = bytearray(b'\x01') * (self.ARENA_SIZE * self.ARENA_SIZE)
+        forked.__shared_tiles = bytearray(self.__shared_tiles)
+        return forked
+
+    def __own_tile(self, x, y):
+        """Returns the units at a location, copying them first if they may be shared with a fork
+        """
+        if type(self.__map[x][y]) is tuple:
+            units = self.__materialize(x, y)
+        else:
+            shared = self.__shared_tiles
+            if shared is not None and shared[x * self.ARENA_SIZE + y]:
+                shared[x * self.ARENA_SIZE + y] = 0
+                units = [copy.copy(unit) for unit in self.__map[x][y]]
+                for unit in units:
+                    if unit.stationary:
+                        unit._game_map = self
+                self.__map[x][y] = units
+            units = self.__map[x][y]
+        if self.__stacks and x * self.ARENA_SIZE + y in self.__stacks:
+            self.__expand_stacks(x, y, units)
+        return units
+
+    def _units_at(self, x, y):
+        """Returns the units at a location without copying them. The list and units must not be modified.
+        """
+        units = self.__map[x][y]
+        if self.__stacks and x * self.ARENA_SIZE + y in self.__stacks:
+            return self.__own_tile(x, y)
+        if type(units) is tuple:
+            return self.__materialize(x, y)
+        return units
+
+    def __expand_stacks(self, x, y, units):
+        """Builds the GameUnits of the stacks at a location and adds them to its units
+        """
+        for unit_type, player_index, count, health in self.__stacks.pop(x * self.ARENA_SIZE + y):
+            unit = GameUnit(unit_type, self.config, player_index, health, x, y)
+            units.append(unit)
+            units.extend(copy.copy(unit) for _ in range(count - 1))
+
+    def _structure_at(self, x, y):
+        """Describes the structure at a location without building its GameUnit, for scans over the whole map.
+
+        Returns:
+            A (UnitStats, player_index, health) tuple, or None if there is no structure at the location
+
+        """
+        units = self.__map[x][y]
+        if not units or not (self.structure_bits >> (x * self.ARENA_SIZE + y)) & 1:
+            return None
+        if type(units) is tuple:
+            row = self.__columns.structures.get(x * self.ARENA_SIZE + y)
+            return None if row is None else (self.__columns.stats(row), self.__columns.owners[row], self.__columns.health[row])
+        for unit in units:
+            if unit.stationary:
+                return (unit._stats, unit.player_index, unit.health)
+        return None
+
+    def _structures(self):
+        """Describes every structure on the map without building their GameUnits, see _structure_at
+
+        Yields:
+            An (x, y, UnitStats, player_index, health) tuple per structure
+
+        """
+        size = self.ARENA_SIZE
+        bits = self.structure_bits
+        while bits:
+            low_bit = bits & -bits
+            bits ^= low_bit
+            x, y = divmod(low_bit.bit_length() - 1, size)
+            structure = self._structure_at(x, y)
+            if structure is not None:
+                yield (x, y) + structure
+
+    def _units(self):
+        """Describes every unit on the map without building GameUnits or expanding stacks, for GameState.snapshot
+
+        Yields:
+            A (type_index, x, y, player_index, health, upgraded, pending_removal) tuple per unit, ordered by location
+
+        """
+        size = self.ARENA_SIZE
+        columns = self.__columns
+        stacks = self.__stacks
+        type_index = self._type_index
+        for x, column in enumerate(self.__map):
+            for y, units in enumerate(column):
+                if units and type(units) is tuple:
+                    for row in units:
+                        flags = columns.flags[row]
+                        yield (columns.types[row], x, y, columns.owners[row], columns.health[row],
+                               bool(flags & UPGRADED), bool(flags & PENDING_REMOVAL))
+                elif units:
+                    for unit in units:
+                        yield (type_index[unit.unit_type], x, y, unit.player_index, unit.health, unit.upgraded, unit.pending_removal)
+                if stacks and x * size + y in stacks:
+                    for unit_type, player_index, count, health in stacks[x * size + y]:
+                        description = (type_index[unit_type], x, y, player_index, health, False, False)
+                        for _ in range(count):
+                            yield description
+
+    def _load_units(self, columns):
+        """Places the units decoded from a frame on this empty map. Used by GameState while parsing.
+
+        A location holds the rows of its units in columns until it is first accessed, see __materialize,
+        so the GameUnits of locations that are never looked at are never built.
+        """
+        self.__columns = columns
+        size = self.ARENA_SIZE
+        for index, rows in columns.tiles.items():
+            self.__map[index // size][index % size] = rows
+        for index, row in columns.structures.items():
+            upgraded = 1 if columns.flags[row] & UPGRADED else 0
+            self.zobrist_hash ^= self._zobrist_key_at(index, columns.types[row], columns.owners[row], upgraded)
+            self.__set_bit(index, columns.types[row], columns.owners[row], True)
+
+    def __materialize(self, x, y):
+        """Builds the GameUnits of a location still held in the columns of the parsed frame
+        """
+        units = [self.__columns.unit(row) for row in self.__map[x][y]]
+        for unit in units:
+            if unit.stationary:
+                unit._game_map = self
+        self.__map[x][y] = units
+        # The units were just built for this map, so they are not shared with a fork
+        if self.__shared_tiles is not None:
+            self.__shared_tiles[x * self.ARENA_SIZE + y] = 0
+        return units
+
     def print_map(self):
+        rows = []
         for r in range(0, self.ARENA_SIZE):
             row = ""
             for c in range(0, self.ARENA_SIZE):
                 if not self.in_arena_bounds([c,r]):
-                    sys.stderr.write("  ")
+                    row += "  "
                 else:
                     units = self[c,r]
-                    sys.stderr.write(self.unitToString(units) + " ")
-            sys.stderr.write('\n')
+                    row += self.unitToString(units) + " "
+            rows.append(row + '\n')
+        debug_write_raw("".join(rows))
                 
     def unitToString(self, unitList):
         if unitList is None or len(unitList) == 0:
@@ -76,34 +315,99 @@ class GameMap:
                 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
+            old_units = self.__own_tile(location[0], location[1])
             self.__map[location[0]][location[1]] = val
+            self._unhash_structures(old_units)
+            self._hash_structures(val)
+            if any(unit.stationary for unit in old_units) or any(unit.stationary for unit in val):
+                self._structure_changed(list(location))
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        # A new iterator each time, so the map can be iterated in nested loops and from several threads
+        return map(list, self.arena_locations)
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        # Empty tuples are turned into lists the first time a location is accessed, see __materialize
+        return [[()] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)]
+
+    def __build_arena_tables(self):
+        """Builds (once per arena size) the flat tables of the board, indexed by x * ARENA_SIZE + y.
+
+        Returns:
+            A tuple (mask, arena, neighbors, locations). mask[index] is 1 if the location is in the arena bounds,
+            arena holds the index of every location in the arena bounds, neighbors[index] holds
+            the in-bounds neighbors of an index, ordered up, down, right, left, and locations is a
+            frozenset of the (x, y) tuples in the arena bounds.
+        """
+        size = self.ARENA_SIZE
+        tables = _ARENA_TABLES.get(size)
+        if tables is None:
+            mask = bytes(1 if self.__in_diamond(x, y) else 0 for x in range(size) for y in range(size))
+            arena = tuple(index for index in range(size * size) if mask[index])
+            neighbors = []
+            for index in range(size * size):
+                x, y = divmod(index, size)
+                neighbors.append(tuple(nx * size + ny for nx, ny in [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
+                                       if mask[index] and 0 <= nx < size and 0 <= ny < size and mask[nx * size + ny]))
+            locations = frozenset(divmod(index, size) for index in arena)
+            tables = (mask, arena, tuple(neighbors), locations)
+            _ARENA_TABLES[size] = tables
+        return tables
+
+    def __build_location_tables(self):
+        """Builds (once per arena size) the locations in the arena bounds, ordered by row then column.
+
+        Returns:
+            A tuple (locations, halves, quadrants) of tuples of (x, y) tuples. halves[player_index] holds
+            the locations on a player's side, and quadrants[quadrant_description] the locations of a quadrant.
+        """
+        size = self.ARENA_SIZE
+        tables = _LOCATION_TABLES.get(size)
+        if tables is None:
+            half = self.HALF_ARENA
+            locations = tuple((x, y) for y in range(size) for x in range(size) if self._arena_mask[x * size + y])
+            halves = (tuple(location for location in locations if location[1] < half),
+                      tuple(location for location in locations if location[1] >= half))
+            quadrants = [None] * 4
+            quadrants[self.TOP_RIGHT] = tuple((x, y) for x, y in halves[1] if x >= half)
+            quadrants[self.TOP_LEFT] = tuple((x, y) for x, y in halves[1] if x < half)
+            quadrants[self.BOTTOM_LEFT] = tuple((x, y) for x, y in halves[0] if x < half)
+            quadrants[self.BOTTOM_RIGHT] = tuple((x, y) for x, y in halves[0] if x >= half)
+            tables = (locations, halves, tuple(quadrants))
+            _LOCATION_TABLES[size] = tables
+        return tables
+
+    def get_half_locations(self, player_index):
+        """Gets the locations on one player's side of the arena
+
+        Args:
+            player_index: 0 for the bottom half, 1 for the top half
+
+        Returns:
+            A tuple of (x, y) tuples, ordered by row then column. It is shared by every GameMap and must not be changed.
+
+        """
+        if player_index not in (0, 1):
+            self.warn("Passed invalid player_index '{}'. Use 0 for yourself and 1 for your opponent.".format(player_index))
+            return
+        return self.__halves[player_index]
+
+    def get_quadrant_locations(self, quadrant_description):
+        """Gets the locations of one quarter of the arena
+
+        Args:
+            quadrant_description: A constant corresponding to one of the 4 quadrants. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            A tuple of (x, y) tuples, ordered by row then column. It is shared by every GameMap and must not be changed.
+
+        """
+        if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
+            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_quadrant_locations.".format(quadrant_description))
+            return
+        return self.__quadrants[quadrant_description]
 
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
@@ -119,6 +423,14 @@ class GameMap:
         
         """
         x, y = location
+        # One set lookup answers for every location on the board, only other values need the diamond arithmetic
+        if (x, y) in self._arena_locations:
+            return True
+        if type(x) is int and type(y) is int:
+            return False
+        return self.__in_diamond(x, y)
+
+    def __in_diamond(self, x, y):
         half_board = self.HALF_ARENA
 
         row_size = y + 1
@@ -147,8 +459,7 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [list(location) for location in self.__edges[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -157,35 +468,69 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[list(location) for location in edge] for edge in self.__edges]
+
+    def get_edge_set(self, quadrant_description):
+        """Gets the locations of an edge as a set, to check whether a location is on it
+
+        Args:
+            quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            A frozenset of (x, y) tuples. Use (x, y) in edge_set to check a location.
+
+        """
+        if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
+            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_set.".format(quadrant_description))
+            return
+        return self.__edge_sets[quadrant_description]
+
+    def get_edge_bits(self, quadrant_description):
+        """Gets the locations of an edge as a bitboard, see bitboard
+
+        Args:
+            quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            An int with bit x * ARENA_SIZE + y set for each location [x, y] on the edge
+
+        """
+        if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
+            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_bits.".format(quadrant_description))
+            return
+        return self.__edge_bits[quadrant_description]
+
+    def __build_edge_tables(self):
+        """Builds (once per arena size) the locations of the four edges, ordered as in get_edges.
+
+        Returns:
+            A tuple (edges, edge_sets, edge_bits) with one entry per edge: a tuple of (x, y) tuples,
+            a frozenset of the same tuples and a bitboard of them.
+        """
+        tables = _EDGE_TABLES.get(self.ARENA_SIZE)
+        if tables is None:
+            half = self.HALF_ARENA
+            top = self.ARENA_SIZE - 1
+            edges = (tuple((half + num, top - num) for num in range(half)),
+                     tuple((half - 1 - num, top - num) for num in range(half)),
+                     tuple((half - 1 - num, num) for num in range(half)),
+                     tuple((half + num, num) for num in range(half)))
+            edge_sets = tuple(frozenset(edge) for edge in edges)
+            edge_bits = tuple(sum(1 << (x * self.ARENA_SIZE + y) for x, y in edge) for edge in edges)
+            tables = (edges, edge_sets, edge_bits)
+            _EDGE_TABLES[self.ARENA_SIZE] = tables
+        return tables
     
-    def add_unit(self, unit_type, location, player_index=0):
-        """Add a single GameUnit to the map at the given location.
+    def add_unit(self, unit_type, location, player_index=0, count=1, health=None):
+        """Add a GameUnit to the map at the given location.
 
         Args:
             unit_type: The type of the new unit. Use the constants provided in algo_strategy.
             location: A list of two integers representing the [x,y] coordinate of the new unit
             player_index: The index corresponding to the player controlling the new unit, 0 for you 1 for the enemy
+            count: The number of mobile units to add. They are kept as one stack, and their GameUnits are
+                only built when the location is accessed. Structures are never stacked.
+            health: The health of each new unit, their full health if None
 
         This function does not affect your turn and only changes the data stored in GameMap. The intended use of this function
         is to allow you to create arbitrary gamestates. Using this function on the game_map provided with game_state will 
@@ -197,11 +542,124 @@ class GameMap:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
-        new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
-        if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+        stats = UnitCatalog.for_config(self.config).stats(unit_type)
+        if not stats.stationary:
+            health = stats.max_health if health is None else health
+            stacks = self.__stacks.setdefault(x * self.ARENA_SIZE + y, [])
+            for stack in stacks:
+                if stack[0] == unit_type and stack[1] == player_index and stack[3] == health:
+                    stack[2] += count
+                    return
+            stacks.append([unit_type, player_index, count, health])
+            return
+        new_unit = GameUnit(unit_type, self.config, player_index, health, location[0], location[1])
+        units = self.__own_tile(x, y)
+        self._unhash_structures(units)
+        self.__map[x][y] = [new_unit]
+        self._hash_structures([new_unit])
+        self._structure_changed(location)
+
+    def get_stacks(self, location):
+        """Groups the mobile units at a location into stacks of identical units, see add_unit.
+        The answer is the same whether or not game_map[x, y] has built their GameUnits yet.
+
+        Args:
+            location: The location to look at
+
+        Returns:
+            A list of (unit_type, player_index, count, health) tuples, in the order the units were added
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        x, y = location
+        units = self.__map[x][y]
+        if type(units) is tuple:
+            columns = self.__columns
+            described = [(columns.unit_type(row), columns.owners[row], columns.health[row])
+                         for row in units if not columns.stats(row).stationary]
+        else:
+            described = [(unit.unit_type, unit.player_index, unit.health) for unit in units if not unit.stationary]
+        counts = {}
+        for key in described:
+            counts[key] = counts.get(key, 0) + 1
+        for unit_type, player_index, count, health in self.__stacks.get(x * self.ARENA_SIZE + y, ()):
+            key = (unit_type, player_index, health)
+            counts[key] = counts.get(key, 0) + count
+        return [(unit_type, player_index, count, health) for (unit_type, player_index, health), count in counts.items()]
+
+    def count_units(self, location, unit_type=None, player_index=None):
+        """Counts the units at a location without building the GameUnits of its stacks
+
+        Args:
+            location: The location to look at
+            unit_type: Only count units of this type, or units of any type if None
+            player_index: Only count the units of this player, or of both players if None
+
+        Returns:
+            The number of matching units at the location
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        x, y = location
+        count = 0
+        for stack_type, stack_player, stack_count, _ in self.__stacks.get(x * self.ARENA_SIZE + y, ()):
+            if (unit_type is None or stack_type == unit_type) and (player_index is None or stack_player == player_index):
+                count += stack_count
+        units = self.__map[x][y]
+        if type(units) is tuple:
+            columns = self.__columns
+            described = [(columns.unit_type(row), columns.owners[row]) for row in units]
         else:
-            self.__map[x][y] = [new_unit]
+            described = [(unit.unit_type, unit.player_index) for unit in units]
+        for described_type, described_player in described:
+            if (unit_type is None or described_type == unit_type) and (player_index is None or described_player == player_index):
+                count += 1
+        return count
+
+    def remove_units(self, location, unit_type, player_index=0, count=None):
+        """Removes mobile units of one type from a location, taking them from its stacks first
+
+        Args:
+            location: The location to remove units from
+            unit_type: The type of the mobile units to remove
+            player_index: The player controlling the units to remove
+            count: The number of units to remove, or all of them if None
+
+        Returns:
+            The number of units removed
+
+        This function does not affect your turn and only changes the data stored in GameMap, see remove_unit.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return 0
+        x, y = location
+        index = x * self.ARENA_SIZE + y
+        removed = 0
+        stacks = self.__stacks.get(index)
+        if stacks:
+            for stack in stacks:
+                if stack[0] == unit_type and stack[1] == player_index:
+                    taken = stack[2] if count is None else min(stack[2], count - removed)
+                    stack[2] -= taken
+                    removed += taken
+            stacks[:] = [stack for stack in stacks if stack[2] > 0]
+            if not stacks:
+                del self.__stacks[index]
+        if (count is None or removed < count) and self.__map[x][y]:
+            units = self.__own_tile(x, y)
+            kept = []
+            for unit in units:
+                if (count is None or removed < count) and not unit.stationary and unit.unit_type == unit_type and unit.player_index == player_index:
+                    removed += 1
+                else:
+                    kept.append(unit)
+            units[:] = kept
+        return removed
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -216,7 +674,156 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        units = self.__own_tile(x, y)
+        removed_structure = any(unit.stationary for unit in units)
+        self._unhash_structures(units)
         self.__map[x][y] = []
+        if removed_structure:
+            self._structure_changed(location)
+
+    def add_structure_listener(self, listener):
+        """Registers a function to be called whenever add_unit, remove_unit, assigning to game_map[x, y] or upgrading a structure changes the structures on the map.
+
+        Args:
+            listener: A function taking the location that changed, [x, y]
+
+        Changes made by editing the lists returned by game_map[x, y] directly are not reported.
+        """
+        self._structure_listeners.append(listener)
+
+    def remove_structure_listener(self, listener):
+        """Stops calling a function registered with add_structure_listener
+
+        Args:
+            listener: The function to stop calling
+        """
+        if listener in self._structure_listeners:
+            self._structure_listeners.remove(listener)
+
+    def _structure_changed(self, location):
+        for listener in self._structure_listeners:
+            listener(location)
+
+    def _zobrist_key(self, unit, upgraded):
+        index = int(unit.x) * self.ARENA_SIZE + int(unit.y)
+        return self._zobrist_key_at(index, self._type_index[unit.unit_type], unit.player_index, upgraded)
+
+    def _zobrist_key_at(self, index, type_index, player_index, upgraded):
+        owner = 1 if player_index == 1 else 0
+        return _ZOBRIST_KEYS[self._zobrist_size][((index * len(self.config["unitInformation"]) + type_index) * 2 + owner) * 2 + upgraded]
+
+    def _hash_structures(self, units):
+        """Adds structures to the zobrist hash and the bitboards, and lets them report their upgrades back to this map
+        """
+        for unit in units:
+            if unit.stationary:
+                unit._game_map = self
+                self.zobrist_hash ^= self._zobrist_key(unit, unit.upgraded)
+                self.__set_bit(int(unit.x) * self.ARENA_SIZE + int(unit.y), self._type_index[unit.unit_type], unit.player_index, True)
+
+    def _unhash_structures(self, units):
+        for unit in units:
+            if unit.stationary and unit._game_map is self:
+                unit._game_map = None
+                self.zobrist_hash ^= self._zobrist_key(unit, unit.upgraded)
+                self.__set_bit(int(unit.x) * self.ARENA_SIZE + int(unit.y), self._type_index[unit.unit_type], unit.player_index, False)
+
+    def __set_bit(self, index, type_index, player_index, value):
+        bit = 1 << index
+        bitboards = self._bitboards[1 if player_index == 1 else 0]
+        if value:
+            bitboards[type_index] |= bit
+            self.structure_bits |= bit
+        else:
+            bitboards[type_index] &= ~bit
+            self.structure_bits &= ~bit
+
+    def bitboard(self, player_index=None, unit_type=None):
+        """Gets a bitboard of the locations holding structures, bit x * ARENA_SIZE + y is set if [x, y] holds one.
+        Bitboards are plain ints, so they can be combined with & and | and counted with count_bits.
+
+        Args:
+            player_index: Only structures of this player, or None for both players
+            unit_type: Only structures of this type, or None for every type
+
+        Returns:
+            The bitboard, an int
+
+        """
+        if unit_type is None:
+            if player_index is None:
+                return self.structure_bits
+            bits = 0
+            for type_bits in self._bitboards[player_index]:
+                bits |= type_bits
+            return bits
+        type_index = self._type_index[unit_type]
+        if player_index is None:
+            return self._bitboards[0][type_index] | self._bitboards[1][type_index]
+        return self._bitboards[player_index][type_index]
+
+    def region_bits(self, xs=None, ys=None):
+        """Gets a bitboard of the arena locations whose x is in xs and whose y is in ys
+
+        Args:
+            xs: The allowed x coordinates, or None for any
+            ys: The allowed y coordinates, or None for any
+
+        """
+        xs = None if xs is None else frozenset(xs)
+        ys = None if ys is None else frozenset(ys)
+        bits = _REGION_BITS.get((xs, ys))
+        if bits is None:
+            size = self.ARENA_SIZE
+            mask = self._arena_mask
+            bits = 0
+            for x in (range(size) if xs is None else xs):
+                for y in (range(size) if ys is None else ys):
+                    if 0 <= x < size and 0 <= y < size and mask[x * size + y]:
+                        bits |= 1 << (x * size + y)
+            _REGION_BITS[(xs, ys)] = bits
+        return bits
+
+    def location_bits(self, locations):
+        """Gets a bitboard with the bits of a list of locations set
+        """
+        bits = 0
+        for x, y in locations:
+            bits |= 1 << (x * self.ARENA_SIZE + y)
+        return bits
+
+    def count_bits(self, bits):
+        """The number of locations set in a bitboard
+        """
+        return _popcount(bits)
+
+    def count_structures(self, player_index=None, unit_type=None, region=None):
+        """Counts structures without looking at any location, see bitboard
+
+        Args:
+            player_index: Only count structures of this player, or None for both players
+            unit_type: Only count structures of this type, or None for every type
+            region: A bitboard of the locations to count in, such as one from region_bits, or None for the whole map
+
+        Returns:
+            The number of structures
+
+        """
+        bits = self.bitboard(player_index, unit_type)
+        if region is not None:
+            bits &= region
+        return _popcount(bits)
+
+    def _has_structure(self, x, y):
+        """Whether there is a structure at a location, a single bit test
+        """
+        return (self.structure_bits >> (x * self.ARENA_SIZE + y)) & 1 == 1
+
+    def _structure_upgraded(self, unit):
+        """Called by GameUnit.upgrade on structures placed on this map
+        """
+        self.zobrist_hash ^= self._zobrist_key(unit, False) ^ self._zobrist_key(unit, True)
+        self._structure_changed([int(unit.x), int(unit.y)])
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -234,16 +841,16 @@ class GameMap:
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
-        x, y = location
+        x, y = map(int, location)
+        size = self.ARENA_SIZE
+        mask = self._arena_mask
         locations = []
-        search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
-        for i in range(int(x - search_radius), int(x + search_radius + 1)):
-            for j in range(int(y - search_radius), int(y + search_radius + 1)):
-                new_location = [i, j]
-                # A unit with a given range affects all locations whose centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
+        # A unit with a given range affects all locations whose centers are within that range + get hit radius
+        for dx, dy in _range_offsets(radius, self._hit_radius):
+            i = x + dx
+            j = y + dy
+            if 0 <= i < size and 0 <= j < size and mask[i * size + j]:
+                locations.append([i, j])
         return locations
 
     def get_locations_in_range_mod(self, location, radius):
@@ -309,4 +916,4 @@ class GameMap:
         Used internally by game_map to print out default messaging
         """
         if(self.enable_warnings):
-            debug_write(message)
+            debug_write(message, level=WARNING)
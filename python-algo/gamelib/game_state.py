@@ -1,10 +1,15 @@
+import copy
 import math
 import json
 import sys
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .path_cache import SHARED_PATH_CACHE
+from .threat_map import ThreatMap
+from .util import send_command, debug_write, json_loads, WARNING
 from .unit import GameUnit
+from .unit_catalog import UnitCatalog
+from .unit_columns import UnitColumns
 from .game_map import GameMap
 
 def is_stationary(unit_type):
@@ -17,6 +22,116 @@ def is_stationary(unit_type):
     """
     return unit_type in STRUCTURE_TYPES
 
+# Used to decode single values out of a frame, see GameFrame.scan
+_DECODER = json.JSONDecoder()
+
+def _value_position(frame_string, key, start):
+    """The position of the value of the first "key" member at or after start, or -1 if there is none
+    """
+    position = frame_string.find('"' + key + '"', start)
+    if position == -1:
+        return -1
+    position = frame_string.find(":", position + len(key) + 2)
+    if position == -1:
+        return -1
+    position += 1
+    while frame_string[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+class GameFrame(str):
+    """A frame received from the engine, decoded once and shared by everything that reads it.
+
+    It is still the string the engine sent, so code written for raw frames keeps working,
+    but the decoded JSON is available as data and GameState reads it instead of decoding the string again.
+
+    Attributes :
+        * data (dict): The decoded frame
+        * config (JSON): The game configuration, used to build game_state
+        * game_state (:obj: GameState): A GameState of this frame, built the first time it is used
+
+    """
+    def __new__(cls, frame_string, config=None, data=None):
+        """
+        Args:
+            frame_string: The frame as sent by the engine
+            config: The game configuration
+            data: The decoded frame, if it was already decoded. See GameFrame.partial for frames only partly decoded.
+
+        """
+        frame = super().__new__(cls, frame_string)
+        frame.data = json_loads(frame_string) if data is None else data
+        frame.config = config
+        frame.__game_state = None
+        return frame
+
+    @classmethod
+    def of(cls, frame, config=None):
+        """Returns frame if it is already a GameFrame, otherwise decodes it into one
+        """
+        return frame if isinstance(frame, GameFrame) else cls(frame, config)
+
+    @classmethod
+    def partial(cls, frame_string, fields, config=None):
+        """Decodes only some fields of a frame, see GameFrame.scan. turnInfo is always decoded.
+        The game_state of a partial frame can only be used if every field GameState reads was decoded.
+
+        Args:
+            frame_string: The frame as sent by the engine
+            fields: The fields to decode
+            config: The game configuration
+
+        Returns:
+            A GameFrame whose data only holds the decoded fields
+
+        """
+        return cls(frame_string, config, cls.scan(frame_string, "turnInfo", *fields))
+
+    @staticmethod
+    def scan(frame_string, *fields):
+        """Decodes some fields of a frame without decoding the rest of it.
+
+        Each field is a member name, or a dotted path to a member of a member such as "events.breach".
+        Members are found by searching the frame for their name, which only works because the names
+        of the members of a frame never appear anywhere else in it.
+
+        Args:
+            frame_string: The frame as sent by the engine
+            fields: The fields to decode
+
+        Returns:
+            A dict laid out like the decoded frame, holding only the fields that were found
+
+        """
+        data = {}
+        for field in fields:
+            keys = field.split(".")
+            position = 0
+            for key in keys:
+                position = _value_position(frame_string, key, position)
+                if position == -1:
+                    break
+            else:
+                target = data
+                for key in keys[:-1]:
+                    target = target.setdefault(key, {})
+                target[keys[-1]] = _DECODER.raw_decode(frame_string, position)[0]
+        return data
+
+    @property
+    def game_state(self):
+        if self.__game_state is None:
+            self.__game_state = GameState(self.config, self)
+        return self.__game_state
+
+    @property
+    def turn_info(self):
+        """The turnInfo of the frame: [frame type, turn number, action frame number]
+        """
+        return self.data["turnInfo"]
+
+
 class GameState:
     """Represents the entire gamestate for a given turn
     Provides methods related to resources and unit deployment
@@ -44,6 +159,9 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache (:obj: PathCache): The cache used by find_path_to_edge, shared between game states
+        * unit_catalog (:obj: UnitCatalog): The stats of every unit type
+        * threat_map (:obj: ThreatMap): The damage structures deal at every location, built on first use and kept up to date as structures change
 
     """
 
@@ -52,11 +170,13 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn.
+              A GameFrame or an already decoded frame is used without decoding it again.
 
         """
         self.serialized_string = serialized_string
         self.config = config
+        self.unit_catalog = UnitCatalog.for_config(config)
         self.enable_warnings = True
 
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
@@ -90,20 +210,113 @@ class GameState:
         SP = self.SP
 
         self.game_map: GameMap = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self.path_cache = SHARED_PATH_CACHE
+        self._shortest_path_finder = ShortestPathFinder(self.path_cache)
         self._build_stack = []
+        # Several units spawned on one location are a single (unit_type, x, y, count) entry, see submit_turn
         self._deploy_stack = []
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
+        self._max_attack_range = self.unit_catalog.max_attack_range
         self.__parse_state(serialized_string)
+        # Built the first time it is used, see threat_map
+        self._threat_map = None
+
+    def fork(self):
+        """Makes a copy of this game state that can be changed without affecting the original.
+
+        This is much cheaper than copy.deepcopy. The config is shared, and the units on the map are
+        only copied the first time their location is accessed, see GameMap.fork.
+        Units taken from the original map before forking are not copied, so do not modify them afterwards.
+
+        Returns:
+            A new GameState
+
+        """
+        forked = copy.copy(self)
+        forked.game_map = self.game_map.fork()
+        forked._shortest_path_finder = self._shortest_path_finder.fork(forked)
+        forked._threat_map = None if self._threat_map is None else self._threat_map.fork(forked.game_map)
+        forked._build_stack = list(self._build_stack)
+        forked._deploy_stack = list(self._deploy_stack)
+        forked._player_resources = [dict(resources) for resources in self._player_resources]
+        return forked
+
+    def __deepcopy__(self, memo):
+        # The path-finder and threat map listen to the map for changes, so like fork the copy gets its own,
+        # tracking the copied map, instead of deep copies still registered on the original map
+        copied = copy.copy(self)
+        memo[id(self)] = copied
+        for name, value in self.__dict__.items():
+            if name not in ("_shortest_path_finder", "_threat_map"):
+                copied.__dict__[name] = copy.deepcopy(value, memo)
+        copied._shortest_path_finder = self._shortest_path_finder.fork(copied)
+        copied._threat_map = None if self._threat_map is None else self._threat_map.fork(copied.game_map)
+        return copied
+
+    @property
+    def threat_map(self):
+        """The ThreatMap of this game state, built from the map the first time it is used
+        """
+        if self._threat_map is None:
+            self._threat_map = ThreatMap(self.game_map)
+        return self._threat_map
+
+    def snapshot(self):
+        """Gets a compact description of this game state that is cheap to send to another process.
+        It holds the turn number, the players' stats and every unit on the map, including changes made this turn.
+
+        Returns:
+            A tuple of plain values, which GameState.from_snapshot turns back into a GameState
+
+        """
+        # Read from the map's columns and stacks, so taking a snapshot does not build any GameUnits
+        units = tuple(self.game_map._units())
+        stats = ((self.my_health, self.get_resource(SP, 0), self.get_resource(MP, 0), self.my_time),
+                 (self.enemy_health, self.get_resource(SP, 1), self.get_resource(MP, 1), self.enemy_time))
+        return (self.turn_number, stats, units)
+
+    @classmethod
+    def from_snapshot(cls, config, snapshot):
+        """Rebuilds a game state from GameState.snapshot
+
+        Args:
+            config: The game configuration
+            snapshot: A snapshot returned by GameState.snapshot
+
+        Returns:
+            A new GameState
+
+        """
+        turn_number, stats, units = snapshot
+        unit_lists = [[[] for _ in config["unitInformation"]], [[] for _ in config["unitInformation"]]]
+        # The removal and upgrade lists are read after the units they refer to, as in a frame from the engine
+        remove_index, upgrade_index = UnitColumns.action_indices(config)
+        for type_index, x, y, player_index, health, upgraded, pending_removal in units:
+            lists = unit_lists[player_index]
+            lists[type_index].append([x, y, health, ""])
+            if pending_removal:
+                lists[remove_index].append([x, y, 0, ""])
+            if upgraded:
+                lists[upgrade_index].append([x, y, 0, ""])
+        frame = {"turnInfo": [0, turn_number, -1], "p1Stats": list(stats[0]), "p2Stats": list(stats[1]),
+                 "p1Units": unit_lists[0], "p2Units": unit_lists[1]}
+        # Parsed as an already decoded frame, so serialized_string is this dict
+        return cls(config, frame)
 
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
+        The units are decoded into a UnitColumns, their GameUnits are built when their location is first accessed.
         state_line is the game state as a json string.
         """
-        state = json.loads(state_line)
+        if isinstance(state_line, GameFrame):
+            state = state_line.data
+        elif isinstance(state_line, dict):
+            state = state_line
+        else:
+            state = json_loads(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -120,34 +333,7 @@ class GameState:
             {'SP': p1_SP, 'MP': p1_MP},
             {'SP': p2_SP, 'MP': p2_MP}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
-
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
-
-    def __create_parsed_units(self, units, player_number):
-        """
-        Helper function for __parse_state to add units to the map.
-        """
-        typedef = self.config.get("unitInformation")
-        for i, unit_types in enumerate(units):
-            for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
-                # This depends on RM and UP always being the last types to be processed
-                if unit_type == REMOVE:
-                    # Quick fix will deploy engine fix soon
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
-                elif unit_type == UPGRADE:
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
-                else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+        self.game_map._load_units(UnitColumns.from_frame(self.unit_catalog, state, self.ARENA_SIZE))
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -176,9 +362,14 @@ class GameState:
             Must be called at the end of your turn or the algo will hang.
         """
         build_string = json.dumps(self._build_stack)
-        deploy_string = json.dumps(self._deploy_stack)
-        send_command(build_string)
-        send_command(deploy_string)
+        deploy_stack = []
+        for entry in self._deploy_stack:
+            if len(entry) == 4:
+                deploy_stack.extend([entry[:3]] * entry[3])
+            else:
+                deploy_stack.append(entry)
+        deploy_string = json.dumps(deploy_stack)
+        send_command(build_string, deploy_string)
 
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
@@ -296,12 +487,8 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        cost_base = [unit_def.get('cost1', 0), unit_def.get('cost2', 0)]
-        if upgrade:
-            return [unit_def.get('upgrade', {}).get('cost1', cost_base[SP]), unit_def.get('upgrade', {}).get('cost2', cost_base[MP])]
-
-        return cost_base
+        stats = self.unit_catalog.stats(unit_type)
+        return list(stats.upgrade_cost if upgrade else stats.cost)
 
 
     def can_spawn(self, unit_type, location, num=1):
@@ -324,16 +511,38 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         
+        return self.__can_spawn_at(unit_type, location, num, self.number_affordable(unit_type) >= num, is_stationary(unit_type))
+
+    def can_spawn_many(self, unit_type, locations, num=1):
+        """Finds the locations of a list where we can spawn a unit, checking the unit and its cost only once.
+
+        Each location is checked on its own, as by can_spawn, so spawning at all of them may cost more than we have.
+
+        Args:
+            unit_type: The type of the unit
+            locations: The locations we want to check
+            num: The number of units we want to spawn at each location
+
+        Returns:
+            A list of the locations where we can spawn the unit(s), in the order given
+
+        """
+        if unit_type not in ALL_UNITS:
+            self._invalid_unit(unit_type)
+            return
+        affordable = self.number_affordable(unit_type) >= num
+        stationary = is_stationary(unit_type)
+        return [location for location in locations if self.__can_spawn_at(unit_type, location, num, affordable, stationary)]
+
+    def __can_spawn_at(self, unit_type, location, num, affordable, stationary):
         if not self.game_map.in_arena_bounds(location):
             if self.enable_warnings:
                 self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
             return False
 
-        affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = (location[0], location[1]) in self.game_map._spawn_edges
 
         if self.enable_warnings:
             fail_reason = ""
@@ -373,22 +582,29 @@ class GameState:
       
         if type(locations[0]) == int:
             locations = [locations]
+        stationary = is_stationary(unit_type)
+        costs = self.type_cost(unit_type)
         spawned_units = 0
         for location in locations:
-            for i in range(num):
-                if self.can_spawn(unit_type, location, 1):
-                    x, y = map(int, location)
-                    costs = self.type_cost(unit_type)
-                    self.__set_resource(SP, 0 - costs[SP])
-                    self.__set_resource(MP, 0 - costs[MP])
-                    self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
-                    else:
-                        self._deploy_stack.append((unit_type, x, y))
-                    spawned_units += 1
-                else:
-                    break
+            if not self.can_spawn(unit_type, location, 1):
+                continue
+            # The location is valid, so only the cost limits how many mobile units can be spawned on it
+            count = 1 if stationary else min(num, self.number_affordable(unit_type))
+            x, y = map(int, location)
+            self.__set_resource(SP, 0 - costs[SP] * count)
+            self.__set_resource(MP, 0 - costs[MP] * count)
+            self.game_map.add_unit(unit_type, location, 0, count)
+            if stationary:
+                self._build_stack.append((unit_type, x, y))
+            elif count == 1:
+                self._deploy_stack.append((unit_type, x, y))
+            else:
+                # Expanded into count entries by submit_turn
+                self._deploy_stack.append((unit_type, x, y, count))
+            spawned_units += count
+            if count < num and self.enable_warnings:
+                # Warns about why the rest could not be spawned
+                self.can_spawn(unit_type, location, 1)
         return spawned_units
 
     def attempt_remove(self, locations):
@@ -439,7 +655,7 @@ class GameState:
                     if unit.stationary:
                         existing_unit = unit
 
-                if not existing_unit.upgraded and self.config["unitInformation"][UNIT_TYPE_TO_INDEX[existing_unit.unit_type]].get("upgrade", None) is not None:
+                if not existing_unit.upgraded and self.unit_catalog.stats(existing_unit.unit_type).upgradable:
                     costs = self.type_cost(existing_unit.unit_type, True)
                     resources = self.get_resources()
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
@@ -498,6 +714,43 @@ class GameState:
         end_points = self.game_map.get_edge_locations(target_edge)
         return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
 
+    def find_paths_to_edge(self, start_locations, target_edge=None):
+        """Gets the paths units at several locations would take.
+        Much faster than calling find_path_to_edge once per location, since the
+        pathlengths towards each edge are only computed once.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start location if None.
+
+        Returns:
+            A list with the path of each unit, in the same order as start_locations.
+            The entry is None if the starting location is blocked.
+
+        """
+        end_points_list = []
+        for start_location in start_locations:
+            if self.contains_stationary_unit(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            end_points_list.append(self.game_map.get_edge_locations(edge))
+        return self._shortest_path_finder.navigate_start_points(start_locations, end_points_list, self)
+
+    def set_dynamic_pathing(self, enabled=True):
+        """Turns dynamic path-finding on or off.
+
+        With dynamic path-finding, find_path_to_edge keeps its search data between calls and only repairs
+        it locally when a structure is added or removed, instead of rebuilding it from the whole map.
+        This is much faster when searching repeatedly on a map that is edited with game_map.add_unit and
+        game_map.remove_unit, for example while simulating an attack that destroys structures.
+        Edits made directly to the lists returned by game_map[x, y] are not seen while it is enabled.
+
+        Args:
+            enabled: True to turn dynamic path-finding on, False to turn it off
+
+        """
+        self._shortest_path_finder.set_dynamic(enabled)
+
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
 
@@ -512,6 +765,9 @@ class GameState:
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
         x, y = map(int, location)
+        # Most locations are empty, the bitboard answers for them without looking at the location
+        if not self.game_map._has_structure(x, y):
+            return False
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
@@ -522,7 +778,7 @@ class GameState:
         """
 
         if(self.enable_warnings):
-            debug_write(message)
+            debug_write(message, level=WARNING)
 
     def suppress_warnings(self, suppress):
         """Suppress all warnings
@@ -713,16 +969,15 @@ class GameState:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
             self.warn("Location {} is not in the arena bounds.".format(location))
+        elif not self.threat_map.damage_at(location, player_index):
+            # Nothing can attack the location, so there is no need to search around it
+            return []
 
         attackers = []
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
+        possible_locations= self.game_map.get_locations_in_range(location, self._max_attack_range)
         for location_unit in possible_locations:
             for unit in self.game_map[location_unit]:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
@@ -735,16 +990,15 @@ class GameState:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
             self.warn("Location {} is not in the arena bounds.".format(location))
+        elif dead_attackers is None:
+            # The threat map already holds the damage at every location, only dead attackers need a search
+            return self.threat_map.damage_at(location, player_index)
 
         attackers = []
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
+        possible_locations= self.game_map.get_locations_in_range(location, self._max_attack_range)
         for location_unit in possible_locations:
             for unit in self.game_map[location_unit]:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
@@ -1,24 +1,26 @@
 import heapq
-import math
-import sys
-import queue
-from .util import debug_write
+from array import array
+from collections import deque
+from .util import debug_write, debug_write_raw
 
-class Node:
-    """A path-finding node
-
-    Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+_IDEALNESS = {}
 
+def _idealness_table(size, direction):
+    """The idealness of every flat index for units heading in a direction, see ShortestPathFinder._get_idealness.
+    Computed once per direction and shared by every path-finder.
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    key = (size, direction[0], direction[1])
+    table = _IDEALNESS.get(key)
+    if table is None:
+        table = []
+        for index in range(size * size):
+            x, y = divmod(index, size)
+            idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+            idealness += x if direction[0] == 1 else 27 - x
+            table.append(idealness)
+        table = tuple(table)
+        _IDEALNESS[key] = table
+    return table
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +30,82 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles path-finding
 
+    All per-location search state is kept in flat arrays indexed by x * ARENA_SIZE + y.
+    The arrays are allocated once and reset between searches, so repeated queries do not allocate.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (bytearray): 1 if there is a structure at the index
+        * visited_idealness (bytearray): 1 if the index was visited during the idealness search step
+        * pathlength (array): The distance between the index and the target location, -1 if it was not reached during validation
+        * dynamic (bool): If true, blocked locations and the pathlengths towards each edge are kept between searches and
+          repaired locally whenever GameMap.add_unit or GameMap.remove_unit changes a structure. See set_dynamic.
+        * cache (:obj: PathCache): If set, paths are looked up in and stored to this cache
 
     """
-    def __init__(self):
+    def __init__(self, cache=None):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self.size = 0
+        self.cache = cache
+        self.dynamic = False
+        self._tracked_map = None
+        self._fields = {}
+
+    def set_dynamic(self, enabled):
+        """Turns dynamic path-finding on or off
+
+        In dynamic mode the first search builds the blocked locations from the map, and later changes are
+        applied incrementally instead of rebuilding the whole map for every search. This makes repeated searches
+        after destroying or placing single structures much cheaper, for example when simulating an attack.
+        Only changes made through GameMap.add_unit and GameMap.remove_unit are seen by the path-finder.
+
+        Args:
+            enabled: True to turn dynamic path-finding on, False to turn it off
+        """
+        self.dynamic = enabled
+        if not enabled:
+            self._untrack()
+
+    def _track(self, game_state):
+        """Builds the blocked locations for game_state and starts listening to its map for changes
+        """
+        self._untrack()
+        self.initialize_map(game_state)
+        self._fill_blocked()
+        self._tracked_map = game_state.game_map
+        self._tracked_map.add_structure_listener(self._on_structure_change)
+
+    def fork(self, game_state):
+        """Makes a path-finder for a fork of the game state this one searches, see GameState.fork.
+        In dynamic mode the blocked locations and pathlengths are copied, so the fork does not rebuild them.
+
+        Args:
+            game_state: The forked GameState
+
+        Returns:
+            A new ShortestPathFinder
+
+        """
+        forked = ShortestPathFinder(self.cache)
+        forked.dynamic = self.dynamic
+        if self.dynamic and self._tracked_map is not None:
+            forked.initialize_map(game_state)
+            forked.blocked[:] = self.blocked
+            forked._fields = {key: array('h', field) for key, field in self._fields.items()}
+            forked._tracked_map = game_state.game_map
+            forked._tracked_map.add_structure_listener(forked._on_structure_change)
+        return forked
+
+    def _untrack(self):
+        if self._tracked_map is not None:
+            self._tracked_map.remove_structure_listener(self._on_structure_change)
+        self._tracked_map = None
+        self._fields = {}
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,10 +113,22 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
+        #Initialize map
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        size = game_state.ARENA_SIZE
+        if self.size != size:
+            self.size = size
+            self._arena, self._neighbors = game_state.game_map._arena_indices, game_state.game_map._neighbors
+            self._zeros = bytes(size * size)
+            self._unset = array('h', [-1]) * (size * size)
+            self.blocked = bytearray(self._zeros)
+            self.visited_idealness = bytearray(self._zeros)
+            self._scratch = array('h', self._unset)
+            self.pathlength = self._scratch
+        else:
+            self.blocked[:] = self._zeros
+            self._reset_search()
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -68,44 +146,281 @@ class ShortestPathFinder:
         if game_state.contains_stationary_unit(start_point):
             return
 
-        #Initialize map 
-        self.initialize_map(game_state)
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        if self.dynamic:
+            if self._tracked_map is not game_state.game_map:
+                self._track(game_state)
+            self.game_state = game_state
+        else:
+            #Initialize map
+            self.initialize_map(game_state)
+            #Fill in walls
+            self._fill_blocked()
+
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(self._layout_key(), start_point, end_points)
+            path = self.cache.get(key)
+            if path is not None:
+                return path
+
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
+        if self.dynamic:
+            path = self._navigate_dynamic(start_point, end_points)
+        else:
+            path = self._navigate(start_point, end_points)
+        if key is not None:
+            self.cache.put(key, path)
+        return path
+
+    def navigate_start_points(self, start_points, end_points_list, game_state):
+        """Finds the paths units at several starting locations would take
+
+        The pathlengths towards a set of endpoints do not depend on where the unit starts, so they are
+        computed once per distinct set of endpoints and every path that reaches its edge is read from them.
+        Units that cannot reach their edge fall back to the self destruct search of navigate_multiple_endpoints.
+
+        Args:
+            * start_points: The starting locations of the units
+            * end_points_list: The end points of each unit, end_points_list[i] is used for start_points[i]
+            * game_state: The current game state
+
+        Returns:
+            A list with the path of each unit, in the same order as start_points.
+            The entry is None if the starting location is blocked.
+
+        """
+        if self.dynamic:
+            # The pathlengths towards each edge are already cached between searches
+            return [self.navigate_multiple_endpoints(start_point, end_points, game_state)
+                    for start_point, end_points in zip(start_points, end_points_list)]
+
+        paths = [None] * len(start_points)
+        unblocked = [i for i, start_point in enumerate(start_points) if not game_state.contains_stationary_unit(start_point)]
+        if not unblocked:
+            return paths
+
+        self.initialize_map(game_state)
+        self._fill_blocked()
+        cache_keys = {}
+        if self.cache is not None:
+            layout_key = self._layout_key()
+        groups = {}
+        for i in unblocked:
+            end_points = end_points_list[i]
+            if self.cache is not None:
+                key = self._cache_key(layout_key, start_points[i], end_points)
+                paths[i] = self.cache.get(key)
+                if paths[i] is not None:
+                    continue
+                cache_keys[i] = key
+            group_key = tuple(map(tuple, end_points))
+            if group_key not in groups:
+                groups[group_key] = (end_points, [])
+            groups[group_key][1].append(i)
+
+        size = self.size
+        pathlength = self.pathlength
+        unreachable = []
+        for end_points, indices in groups.values():
+            self._reset_search()
+            direction = self._get_direction_from_endpoints(end_points)
+            self._fill_pathlengths([x * size + y for x, y in end_points])
+            for i in indices:
+                start_point = start_points[i]
+                if pathlength[start_point[0] * size + start_point[1]] == -1:
+                    unreachable.append((i, end_points))
+                else:
+                    paths[i] = self._get_path(start_point, direction)
+
+        for i, end_points in unreachable:
+            self._reset_search()
+            paths[i] = self._navigate(start_points[i], end_points)
+        for i, key in cache_keys.items():
+            self.cache.put(key, paths[i])
+        return paths
+
+    def _layout_key(self):
+        """The occupancy bitboard of the structures, see GameMap.structure_bits
+        """
+        return self.game_state.game_map.structure_bits
+
+    def _cache_key(self, layout_key, start_point, end_points):
+        size = self.size
+        return (layout_key, start_point[0] * size + start_point[1], tuple(x * size + y for x, y in end_points))
+
+    def _navigate(self, start_point, end_points):
+        """Runs the idealness search, validation and path steps on an initialized map
+        """
+        size = self.size
+        start = start_point[0] * size + start_point[1]
+        end_indices = [x * size + y for x, y in end_points]
+        direction = self._get_direction_from_endpoints(end_points)
+        ideal_endpoint = self._idealness_search(start, end_indices, direction)
+        self._validate(ideal_endpoint, end_indices)
+        return self._get_path(start_point, direction)
+
+    def _navigate_dynamic(self, start_point, end_points):
+        """Finds a path using the kept pathlengths towards end_points, computing them if needed
+        """
+        size = self.size
+        end_indices = [x * size + y for x, y in end_points]
+        key = tuple(end_indices)
+        field = self._fields.get(key)
+        if field is None:
+            field = array('h', self._unset)
+            self._fill_pathlengths(end_indices, field)
+            self._fields[key] = field
+
+        if field[start_point[0] * size + start_point[1]] != -1:
+            self.pathlength = field
+            return self._get_path(start_point, self._get_direction_from_endpoints(end_points))
+
+        # The edge cannot be reached, so this is a self destruct path
+        self._reset_search()
+        return self._navigate(start_point, end_points)
+
+    def _on_structure_change(self, location):
+        """Updates the blocked locations and repairs every cached field after a structure was added or removed
+        """
+        x, y = location
+        index = x * self.size + y
+        blocked = self._tracked_map._has_structure(x, y)
+        if blocked == bool(self.blocked[index]):
+            return
+        self.blocked[index] = blocked
+        for key, field in self._fields.items():
+            if blocked:
+                self._repair_blocked(index, field, key)
+            else:
+                self._repair_unblocked(index, field, key)
+
+    def _repair_unblocked(self, index, field, end_indices):
+        """Pathlengths can only shrink when a location opens up, so propagate the improvement outwards from it
+        """
+        blocked = self.blocked
+        neighbors = self._neighbors
+        if field[index] != 0:
+            reachable = [field[neighbor] for neighbor in neighbors[index] if not blocked[neighbor] and field[neighbor] != -1]
+            if not reachable:
+                return
+            field[index] = min(reachable) + 1
+
+        current = deque([index])
+        while current:
+            current_location = current.popleft()
+            next_pathlength = field[current_location] + 1
+            for neighbor in neighbors[current_location]:
+                if blocked[neighbor]:
+                    continue
+                if field[neighbor] == -1 or field[neighbor] > next_pathlength:
+                    field[neighbor] = next_pathlength
+                    current.append(neighbor)
 
-    def _idealness_search(self, start, end_points):
+    def _repair_blocked(self, index, field, end_indices):
+        """Find the locations whose every shortest route went through the newly blocked location,
+        then recompute only those from the locations around them
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
+        blocked = self.blocked
+        neighbors = self._neighbors
+        old_pathlength = field[index]
+        if old_pathlength == -1:
+            return
+        if index not in end_indices:
+            field[index] = -1
+
+        # Visit the locations that were one step further than a lost support, in order of distance
+        lost = set()
+        checked = set()
+        current = deque([(index, old_pathlength)])
+        while current:
+            current_location, current_pathlength = current.popleft()
+            for neighbor in neighbors[current_location]:
+                if blocked[neighbor] or neighbor in checked or field[neighbor] != current_pathlength + 1:
+                    continue
+                checked.add(neighbor)
+                supported = False
+                for support in neighbors[neighbor]:
+                    if not blocked[support] and support not in lost and field[support] == current_pathlength:
+                        supported = True
+                        break
+                if not supported:
+                    lost.add(neighbor)
+                    current.append((neighbor, current_pathlength + 1))
+
+        if not lost:
+            return
+        for location in lost:
+            field[location] = -1
+
+        # Dijkstra over the lost locations, seeded from their intact neighbors
+        heap = []
+        for location in lost:
+            reachable = [field[neighbor] for neighbor in neighbors[location] if not blocked[neighbor] and field[neighbor] != -1]
+            if reachable:
+                heap.append((min(reachable) + 1, location))
+        heapq.heapify(heap)
+        while heap:
+            pathlength, location = heapq.heappop(heap)
+            if field[location] != -1:
+                continue
+            field[location] = pathlength
+            for neighbor in neighbors[location]:
+                if neighbor in lost and field[neighbor] == -1:
+                    heapq.heappush(heap, (pathlength + 1, neighbor))
+
+    def _reset_search(self):
+        """Clears the search state while keeping the blocked locations
+        """
+        self.pathlength = self._scratch
+        self.visited_idealness[:] = self._zeros
+        self.pathlength[:] = self._unset
+
+    def _fill_blocked(self):
+        """Marks every location holding a structure as blocked
+        """
+        blocked = self.blocked
+        bits = self.game_state.game_map.structure_bits
+        while bits:
+            low_bit = bits & -bits
+            bits ^= low_bit
+            blocked[low_bit.bit_length() - 1] = 1
+
+    def _idealness_search(self, start, end_indices, direction):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space.
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        end_set = set(end_indices)
+        if start in end_set:
+            return start
+
+        blocked = self.blocked
+        visited = self.visited_idealness
+        neighbors = self._neighbors
+        idealness = _idealness_table(self.size, direction)
+        current = deque([start])
+        best_idealness = idealness[start]
+        visited[start] = 1
         most_ideal = start
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            search_location = current.popleft()
+            for neighbor in neighbors[search_location]:
+                if blocked[neighbor]:
                     continue
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+                # Endpoints are perfectly ideal, so the first one we reach cannot be beaten
+                if neighbor in end_set:
+                    return neighbor
 
+                current_idealness = idealness[neighbor]
                 if current_idealness > best_idealness:
                     best_idealness = current_idealness
                     most_ideal = neighbor
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                if not visited[neighbor]:
+                    visited[neighbor] = 1
+                    current.append(neighbor)
 
         return most_ideal
 
@@ -119,7 +434,7 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -134,116 +449,101 @@ class ShortestPathFinder:
             direction[1] = -1
         return direction
 
-    def _get_idealness(self, location, end_points):
+    def _get_idealness(self, index, direction):
         """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal,
+        and are handled by _idealness_search.
 
         Returns:
-            A location the unit will attempt to reach
+            A number, higher is more ideal
         """
-        if location in end_points:
-            return sys.maxsize
-
-        direction = self._get_direction_from_endpoints(end_points)
+        return _idealness_table(self.size, direction)[index]
 
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
-
-        return idealness
-
-    def _validate(self, ideal_tile, end_points):
+    def _validate(self, ideal_tile, end_indices):
         """Breadth first search of the grid, setting the pathlengths of each node
 
         """
         #VALIDATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+        if ideal_tile in end_indices:
+            self._fill_pathlengths(end_indices)
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
-
-        #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+            self._fill_pathlengths([ideal_tile])
 
         #debug_write("Print after validate")
         #self.print_map()
         return
 
-    def _get_path(self, start_point, end_points):
+    def _fill_pathlengths(self, targets, pathlength=None):
+        """Breadth first search outwards from the targets, which all get a pathlength of 0
+
+        """
+        if pathlength is None:
+            pathlength = self.pathlength
+        current = deque(targets)
+        for location in current:
+            pathlength[location] = 0
+
+        blocked = self.blocked
+        neighbors = self._neighbors
+        #While current is not empty
+        while current:
+            current_location = current.popleft()
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in neighbors[current_location]:
+                if blocked[neighbor] or pathlength[neighbor] != -1:
+                    continue
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
+
+    def _get_path(self, start_point, direction):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
         #GET THE PATH
+        size = self.size
+        pathlength = self.pathlength
         path = [start_point]
-        current = start_point
+        current = start_point[0] * size + start_point[1]
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
+        while not pathlength[current] == 0:
+            #debug_write("current tile {} has cost {}".format(current, pathlength[current]))
+            next_move = self._choose_next_move(current, move_direction, direction)
             #debug_write(next_move)
 
-            if current[0] == next_move[0]:
+            if current // size == next_move // size:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append(list(divmod(next_move, size)))
             current = next_move
-        
+
         #debug_write(path)
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction, direction):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        blocked = self.blocked
+        pathlength = self.pathlength
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
+        best_pathlength = pathlength[current_point]
+        for neighbor in self._neighbors[current_point]:
             #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            if blocked[neighbor]:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[neighbor]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, direction):
                 continue
 
             ideal_neighbor = neighbor
@@ -252,39 +552,41 @@ class ShortestPathFinder:
         #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
+        size = self.size
+        prev_x, prev_y = divmod(prev_tile, size)
+        new_x, new_y = divmod(new_tile, size)
+        best_x, best_y = divmod(prev_best, size)
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
+            if prev_y == new_y:
+                return False
             return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            if prev_x == new_x:
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_y == new_y:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
+
+        #To make it here, both moves are on the same axis
+        if new_y == best_y: #If they both moved horizontal...
+            if direction[0] == 1 and new_x > best_x: #If we moved right and right is our direction, we moved towards our direction
+                return True
+            if direction[0] == -1 and new_x < best_x: #If we moved left and left is our direction, we moved towards our direction
+                return True
+            return False
+        if new_x == best_x: #If they both moved vertical...
+            if direction[1] == 1 and new_y > best_y: #If we moved up and up is our direction, we moved towards our direction
                 return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
+            if direction[1] == -1 and new_y < best_y: #If we moved down and down is our direction, we moved towards our direction
                 return True
             return False
         return True
@@ -297,20 +599,22 @@ class ShortestPathFinder:
             debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
             return
 
+        rows = []
         for y in range(28):
+            row = ""
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                index = x * self.size + 28 - y - 1
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    row += self._print_justified(self.pathlength[index])
                 else:
-                    sys.stderr.write("   ")
-            debug_write("")
+                    row += "   "
+            rows.append(row + "\n")
+        debug_write_raw("".join(rows))
 
     def _print_justified(self, number):
-        """Prints a number between 100 and -10 in 3 spaces
+        """Formats a number between 100 and -10 in 3 spaces
 
         """
         if number < 10 and number > -1:
-            sys.stderr.write(" ")
-        sys.stderr.write(str(number))
-        sys.stderr.write(" ")
+            return " " + str(number) + " "
+        return str(number) + ' '
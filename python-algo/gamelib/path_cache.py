@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+
+class PathCache:
+    """Remembers the paths found by the path-finder.
+
+    A path only depends on the structure layout, the starting location and the target edge,
+    so paths are stored under a key made of the occupancy bitset of the structures, the start
+    and the end points. When the cache is full the least recently used path is evicted.
+
+    A single cache is shared by every GameState (see SHARED_PATH_CACHE), including copies made with
+    copy.deepcopy, so identical searches made anywhere during a turn, or in later turns, are answered instantly.
+    It can be used from several threads at once, such as the BackgroundWorker warming it during the action phase.
+
+    Attributes :
+        * maxsize (int): The maximum number of paths stored
+        * hits (int): The number of searches answered from the cache
+        * misses (int): The number of searches that were not in the cache
+
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__paths = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        """Looks up a path
+
+        Args:
+            key: A key built by the path-finder
+
+        Returns:
+            A copy of the stored path, or None if there is no path stored for the key
+
+        """
+        with self.__lock:
+            path = self.__paths.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__paths.move_to_end(key)
+        return [list(location) for location in path]
+
+    def put(self, key, path):
+        """Stores a path, evicting the least recently used one if the cache is full
+
+        Args:
+            key: A key built by the path-finder
+            path: The path to store
+
+        """
+        path = tuple(tuple(location) for location in path)
+        with self.__lock:
+            self.__paths[key] = path
+            self.__paths.move_to_end(key)
+            if len(self.__paths) > self.maxsize:
+                self.__paths.popitem(last=False)
+
+    def clear(self):
+        """Removes every stored path and resets the counters
+        """
+        with self.__lock:
+            self.__paths.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def hit_rate(self):
+        """The fraction of searches answered from the cache, 0 if there were none
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+    def __len__(self):
+        return len(self.__paths)
+
+    def __deepcopy__(self, memo):
+        # The stored paths do not depend on any one game state, so copies share the cache
+        return self
+
+
+SHARED_PATH_CACHE = PathCache()
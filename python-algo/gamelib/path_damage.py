@@ -0,0 +1,80 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class PathDamageEvaluator:
+    """Scores many paths at once against the damage kept by a ThreatMap.
+
+    Uses NumPy when it is installed, looking up every location of every path with a single
+    indexing operation. Without NumPy the same results are computed in pure Python.
+
+    Attributes :
+        * threat_map (:obj: ThreatMap): The damage at every location
+        * player_index (int): The player controlling the units walking the paths, 0 for you 1 for the enemy
+        * uses_numpy (bool): Whether NumPy is used
+
+    """
+    def __init__(self, threat_map, player_index=0):
+        """Sets up the damage at every location. The evaluator follows later changes to the threat map.
+
+        Args:
+            threat_map: The ThreatMap of a GameState, game_state.threat_map
+            player_index: The player controlling the units walking the paths, 0 for you 1 for the enemy
+
+        """
+        self.threat_map = threat_map
+        self.player_index = player_index
+        self.uses_numpy = np is not None
+        self.__size = threat_map.game_map.ARENA_SIZE
+        field = threat_map.damage_field(player_index)
+        # A view of the threat map's array, not a copy, so it stays up to date
+        self.__field = np.frombuffer(field, dtype=np.float64) if self.uses_numpy else field
+
+    def damage_along(self, paths):
+        """The damage taken at every location of every path
+
+        Args:
+            paths: A list of paths, each a list of locations, such as the ones returned by GameState.find_paths_to_edge
+
+        Returns:
+            A list with, for every path, an array of the damage taken at each of its locations.
+            These are NumPy arrays when NumPy is used, array.array otherwise.
+
+        """
+        if not self.uses_numpy:
+            field = self.__field
+            size = self.__size
+            return [array('d', [field[x * size + y] for x, y in path]) for path in paths]
+        indices, lengths = self.__flatten(paths)
+        damages = self.__field[indices]
+        return np.split(damages, np.cumsum(lengths)[:-1]) if paths else []
+
+    def total_damage(self, paths):
+        """The damage taken in total along every path
+
+        Args:
+            paths: A list of paths, each a list of locations
+
+        Returns:
+            A list with the sum of the damage along each path
+
+        """
+        if not self.uses_numpy:
+            return [sum(damages) for damages in self.damage_along(paths)]
+        if not paths:
+            return []
+        indices, lengths = self.__flatten(paths)
+        path_ids = np.repeat(np.arange(len(paths)), lengths)
+        return np.bincount(path_ids, weights=self.__field[indices], minlength=len(paths)).tolist()
+
+    def __flatten(self, paths):
+        """The flat index of every location of every path, and the length of each path
+        """
+        size = self.__size
+        indices = np.fromiter((x * size + y for path in paths for x, y in path), dtype=np.intp)
+        lengths = np.fromiter((len(path) for path in paths), dtype=np.intp, count=len(paths))
+        return indices, lengths
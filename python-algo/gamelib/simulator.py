@@ -0,0 +1,369 @@
+import math
+
+from .game_map import _range_offsets
+
+_TARGET_OFFSETS = {}
+
+def _target_offsets(radius, hit_radius):
+    """The (dx, dy, distance) of every location in range, nearest first.
+    Ties are ordered by dx then dy, the order get_locations_in_range returns them in.
+    """
+    offsets = _TARGET_OFFSETS.get((radius, hit_radius))
+    if offsets is None:
+        offsets = tuple(sorted(((dx, dy, math.sqrt(dx ** 2 + dy ** 2)) for dx, dy in _range_offsets(radius, hit_radius)),
+                               key=lambda offset: (offset[2], offset[0], offset[1])))
+        _TARGET_OFFSETS[(radius, hit_radius)] = offsets
+    return offsets
+
+
+class _SimUnit:
+    """A unit taking part in a simulation. Much cheaper to create, copy and update than a GameUnit.
+    """
+    __slots__ = ("unit_type", "player_index", "stationary", "x", "y", "health", "speed", "damage_f", "damage_i",
+                 "attack_range", "shield_range", "shield_amount", "target_edge", "path", "path_index",
+                 "move_progress", "steps", "shielded_by")
+
+    def copy(self):
+        unit = _SimUnit.__new__(_SimUnit)
+        for name in _SimUnit.__slots__:
+            setattr(unit, name, getattr(self, name))
+        return unit
+
+
+class SimulationResult:
+    """The outcome of a simulated action phase
+
+    Attributes :
+        * frames (int): The number of frames simulated
+        * breaches (list): The number of mobile units of each player that reached their target edge
+        * breach_damage (list): The health each player took from its opponent by breaching
+        * self_destructs (list): The number of mobile units of each player that self destructed
+        * deaths (list): The number of mobile units of each player that were destroyed
+        * damage_dealt (list): For each player, a dict of the damage its units dealt keyed by the type of the damaged unit
+        * destroyed (list): The (unit_type, x, y, player_index) of every structure destroyed, in order
+        * attacking_structures (list): For each player, the set of (x, y) locations of its structures that attacked
+
+    """
+    def __init__(self):
+        self.frames = 0
+        self.breaches = [0, 0]
+        self.breach_damage = [0, 0]
+        self.self_destructs = [0, 0]
+        self.deaths = [0, 0]
+        self.damage_dealt = [{}, {}]
+        self.destroyed = []
+        self.attacking_structures = [set(), set()]
+
+    def __repr__(self):
+        return "SimulationResult(frames={}, breaches={}, breach_damage={}, deaths={}, destroyed={})".format(
+            self.frames, self.breaches, self.breach_damage, self.deaths, len(self.destroyed))
+
+
+class ActionPhaseSimulator:
+    """Simulates the action phase frame by frame, to predict what happens to mobile units and the structures they attack.
+
+    Every frame, in order:
+        * Supports shield friendly mobile units in range, once per support and unit
+        * Mobile units move along their path, once every 1/speed frames. A unit that cannot move further breaches if
+          it is on its target edge, and otherwise self destructs, damaging nearby enemies if it moved far enough
+        * Mobile units, then structures, attack the target get_target would choose for them
+        * Destroyed units are removed, and mobile units find new paths if a structure was destroyed
+
+    Units are kept in small records rather than GameUnits, and identical mobile units standing on the same
+    location attack together, so a large attack can be simulated in a few milliseconds.
+    The simulation runs on a fork of the game state, which is left unchanged.
+
+    Attributes :
+        * game_state (:obj: GameState): The game state the simulations start from
+        * max_frames (int): The number of frames after which a simulation is stopped
+
+    """
+    def __init__(self, game_state, max_frames=1000):
+        """Reads the structures and the unit stats from a game state
+
+        Args:
+            game_state: The GameState the simulations start from, usually at the start of the action phase
+            max_frames: The number of frames after which a simulation is stopped
+
+        """
+        self.game_state = game_state
+        self.max_frames = max_frames
+        # Simulations fork this copy, so they share its path-finding data instead of each building their own
+        self._base_state = game_state.fork()
+        self._base_state.set_dynamic_pathing(True)
+        game_map = game_state.game_map
+        self._size = game_map.ARENA_SIZE
+        self._hit_radius = game_map._hit_radius
+        self._catalog = game_state.unit_catalog
+        self._edges = [frozenset(x * self._size + y for x, y in game_map.get_edge_locations(edge)) for edge in range(4)]
+        # Read from the map's structure descriptions, so the GameUnits of a parsed frame are not built
+        self._structures = [self._record(stats, player_index, health, x, y) for x, y, stats, player_index, health in game_map._structures()]
+
+    def simulate(self, spawns):
+        """Simulates an action phase in which the given mobile units are spawned
+
+        Args:
+            spawns: A list of (unit_type, location, num, player_index) tuples, one per group of units spawned together
+
+        Returns:
+            A SimulationResult
+
+        """
+        return _Simulation(self, spawns).run()
+
+    def _record(self, stats, player_index, health, x, y):
+        record = _SimUnit()
+        record.unit_type = stats.unit_type
+        record.player_index = player_index
+        record.stationary = stats.stationary
+        record.x = x
+        record.y = y
+        record.health = health
+        record.speed = stats.speed
+        record.damage_f = stats.damage_f
+        record.damage_i = stats.damage_i
+        record.attack_range = stats.attackRange
+        record.shield_range = stats.shieldRange
+        forward = y if player_index == 0 else self._size - 1 - y
+        record.shield_amount = stats.shieldPerUnit + stats.shieldBonusPerY * forward
+        record.target_edge = None
+        record.path = None
+        record.path_index = 0
+        record.move_progress = 0
+        record.steps = 0
+        record.shielded_by = None
+        return record
+
+
+class _Simulation:
+    """The state of a single simulated action phase
+    """
+    def __init__(self, simulator, spawns):
+        self.simulator = simulator
+        self.size = simulator._size
+        self.hit_radius = simulator._hit_radius
+        self.result = SimulationResult()
+        self.game_state = simulator._base_state.fork()
+        self.paths = {}
+
+        self.structures = [structure.copy() for structure in simulator._structures]
+        self.grid = [None] * (self.size * self.size)
+        for structure in self.structures:
+            self.grid[structure.x * self.size + structure.y] = structure
+        self.supports = [structure for structure in self.structures if structure.shield_range > 0 and structure.shield_amount > 0]
+
+        # Mobile units, keyed by the index of their location
+        self.mobile = {}
+        for unit_type, location, num, player_index in spawns:
+            x, y = int(location[0]), int(location[1])
+            stats = simulator._catalog.stats(unit_type)
+            template = simulator._record(stats, player_index, stats.max_health, x, y)
+            template.target_edge = self.game_state.get_target_edge([x, y])
+            stack = self.mobile.setdefault(x * self.size + y, [])
+            for _ in range(num):
+                unit = template.copy()
+                unit.shielded_by = set()
+                stack.append(unit)
+
+    def run(self):
+        result = self.result
+        while self.mobile and result.frames < self.simulator.max_frames:
+            result.frames += 1
+            if self.supports:
+                self.shield()
+            self.move()
+            self.attack()
+            self.remove_destroyed()
+        return result
+
+    def shield(self):
+        size = self.size
+        hit_radius = self.hit_radius
+        for support in self.supports:
+            if support.health <= 0:
+                continue
+            reach = support.shield_range + hit_radius
+            for index, stack in self.mobile.items():
+                x, y = divmod(index, size)
+                if math.sqrt((x - support.x) ** 2 + (y - support.y) ** 2) >= reach:
+                    continue
+                for unit in stack:
+                    if unit.player_index == support.player_index and support not in unit.shielded_by:
+                        unit.shielded_by.add(support)
+                        unit.health += support.shield_amount
+
+    def move(self):
+        size = self.size
+        moved = {}
+        # Self destructs go off once every unit has moved, so they hit the units where they are now
+        self_destructs = []
+        for index, stack in self.mobile.items():
+            for unit in stack:
+                unit.move_progress += unit.speed
+                if unit.move_progress < 1 - 1e-9:
+                    moved.setdefault(index, []).append(unit)
+                    continue
+                unit.move_progress -= 1
+                if unit.path is None:
+                    unit.path = self.path(unit)
+                    unit.path_index = 0
+                if unit.path_index + 1 < len(unit.path):
+                    unit.path_index += 1
+                    unit.x, unit.y = unit.path[unit.path_index]
+                    unit.steps += 1
+                    moved.setdefault(unit.x * size + unit.y, []).append(unit)
+                elif index in self.simulator._edges[unit.target_edge]:
+                    self.breach(unit)
+                else:
+                    self_destructs.append(unit)
+        self.mobile = moved
+        for unit in self_destructs:
+            self.self_destruct(unit)
+
+    def path(self, unit):
+        """The path a unit takes from its location, shared by every unit at the same location going to the same edge
+        """
+        key = (unit.x, unit.y, unit.target_edge)
+        path = self.paths.get(key)
+        if path is None:
+            path = self.game_state.find_path_to_edge([unit.x, unit.y], unit.target_edge) or [[unit.x, unit.y]]
+            self.paths[key] = path
+        return path
+
+    def breach(self, unit):
+        player_index = unit.player_index
+        self.result.breaches[player_index] += 1
+        self.result.breach_damage[player_index] += self.simulator._catalog.stats(unit.unit_type).breach_damage
+
+    def self_destruct(self, unit):
+        stats = self.simulator._catalog.stats(unit.unit_type)
+        self.result.deaths[unit.player_index] += 1
+        if unit.steps < stats.self_destruct_steps:
+            return
+        self.result.self_destructs[unit.player_index] += 1
+        damage_f = stats.self_destruct_damage_f
+        damage_i = stats.self_destruct_damage_i
+        size = self.size
+        for dx, dy, _ in _target_offsets(stats.self_destruct_range, self.hit_radius):
+            x = unit.x + dx
+            y = unit.y + dy
+            if not (0 <= x < size and 0 <= y < size):
+                continue
+            index = x * size + y
+            structure = self.grid[index]
+            if structure is not None and structure.player_index != unit.player_index and structure.health > 0:
+                self.deal(unit.player_index, structure, damage_f)
+            for target in self.mobile.get(index, ()):
+                if target.player_index != unit.player_index and target.health > 0:
+                    self.deal(unit.player_index, target, damage_i)
+
+    def attack(self):
+        size = self.size
+        for index, stack in list(self.mobile.items()):
+            groups = {}
+            for unit in stack:
+                if unit.health > 0:
+                    groups.setdefault((unit.player_index, unit.unit_type), []).append(unit)
+            x, y = divmod(index, size)
+            for group in groups.values():
+                self.group_attack(group[0], len(group), x, y)
+        if not self.mobile:
+            return
+        for structure in self.structures:
+            if structure.health <= 0 or structure.damage_i + structure.damage_f <= 0:
+                continue
+            target = self.target(structure, structure.x, structure.y)
+            if target is not None:
+                self.result.attacking_structures[structure.player_index].add((structure.x, structure.y))
+                self.deal(structure.player_index, target, structure.damage_f if target.stationary else structure.damage_i)
+
+    def group_attack(self, attacker, count, x, y):
+        """Lets count identical units at a location attack, each finishing off its target before the next one picks a new target
+        """
+        while count > 0:
+            target = self.target(attacker, x, y)
+            if target is None:
+                return
+            damage = attacker.damage_f if target.stationary else attacker.damage_i
+            needed = math.ceil(target.health / damage)
+            if needed <= count:
+                count -= needed
+                self.deal(attacker.player_index, target, target.health)
+            else:
+                self.deal(attacker.player_index, target, count * damage)
+                count = 0
+
+    def deal(self, player_index, target, damage):
+        dealt = min(damage, target.health)
+        target.health -= dealt
+        damage_dealt = self.result.damage_dealt[player_index]
+        damage_dealt[target.unit_type] = damage_dealt.get(target.unit_type, 0) + dealt
+
+    def target(self, attacker, x, y):
+        """The unit attacker would attack from (x, y), following the priorities of GameState.get_target
+        """
+        size = self.size
+        half = size / 2 - 0.5
+        own = attacker.player_index
+        best = None
+        best_key = None
+        if attacker.damage_i > 0:
+            reach = attacker.attack_range + self.hit_radius
+            for index, stack in self.mobile.items():
+                tx, ty = divmod(index, size)
+                distance = math.sqrt((tx - x) ** 2 + (ty - y) ** 2)
+                if distance >= reach:
+                    continue
+                for unit in stack:
+                    if unit.player_index == own or unit.health <= 0:
+                        continue
+                    key = (distance, unit.health, ty if own == 0 else -ty, -abs(half - tx), tx)
+                    if best_key is None or key < best_key:
+                        best = unit
+                        best_key = key
+            if best is not None:
+                return best
+        if attacker.damage_f > 0:
+            grid = self.grid
+            for dx, dy, distance in _target_offsets(attacker.attack_range, self.hit_radius):
+                if best_key is not None and distance > best_key[0]:
+                    break
+                tx = x + dx
+                ty = y + dy
+                if not (0 <= tx < size and 0 <= ty < size):
+                    continue
+                unit = grid[tx * size + ty]
+                if unit is None or unit.player_index == own or unit.health <= 0:
+                    continue
+                key = (distance, unit.health, ty if own == 0 else -ty, -abs(half - tx), tx)
+                if best_key is None or key < best_key:
+                    best = unit
+                    best_key = key
+        return best
+
+    def remove_destroyed(self):
+        for index in list(self.mobile):
+            stack = self.mobile[index]
+            alive = [unit for unit in stack if unit.health > 0]
+            for unit in stack:
+                if unit.health <= 0:
+                    self.result.deaths[unit.player_index] += 1
+            if alive:
+                self.mobile[index] = alive
+            else:
+                del self.mobile[index]
+
+        destroyed = [structure for structure in self.structures if structure.health <= 0]
+        if not destroyed:
+            return
+        self.structures = [structure for structure in self.structures if structure.health > 0]
+        self.supports = [support for support in self.supports if support.health > 0]
+        for structure in destroyed:
+            self.grid[structure.x * self.size + structure.y] = None
+            self.game_state.game_map.remove_unit([structure.x, structure.y])
+            self.result.destroyed.append((structure.unit_type, structure.x, structure.y, structure.player_index))
+        # Every mobile unit looks for a new path from where it stands
+        self.paths.clear()
+        for stack in self.mobile.values():
+            for unit in stack:
+                unit.path = None
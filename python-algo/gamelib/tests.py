@@ -1,7 +1,21 @@
 import unittest
 import json
-from .game_state import GameState
+import copy
+import io
+import threading
+from unittest import mock
+from .algocore import AlgoCore
+from .background import BackgroundWorker
+from .game_map import GameMap
+from .game_state import GameState, GameFrame
 from .unit import GameUnit
+from .path_damage import PathDamageEvaluator
+from .simulator import ActionPhaseSimulator, _Simulation
+from .evaluation_pool import EvaluationPool
+from .turn_budget import TurnBudget
+from .unit_catalog import UnitCatalog
+from .unit_columns import UnitColumns
+from . import util
 
 class BasicTests(unittest.TestCase):
 
@@ -215,6 +229,108 @@ class BasicTests(unittest.TestCase):
         self.assertEqual([("DF", 13, 6)], game._build_stack, "Build queue is wrong!")
         self.assertEqual([("SI", 13, 0), ("SI", 13, 0), ("SI", 13, 0)], game._deploy_stack, "Deploy queue is wrong!")
 
+    def test_bulk_spawn(self):
+        game = self.make_turn_0_map()
+        game.suppress_warnings(True)
+        self.assertEqual(5, game.attempt_spawn("PI", [13, 0], 1000), "Only 5 scouts are affordable")
+        self.assertEqual(0, game.get_resource(game.MP))
+        self.assertEqual([("PI", 13, 0, 5)], game._deploy_stack, "The scouts should be one deploy entry")
+        fork = game.fork()
+        units = game.game_map[13, 0]
+        self.assertEqual(5, len(units))
+        self.assertEqual(5, len({id(unit) for unit in units}), "Each scout is its own GameUnit")
+        self.assertTrue(all(unit.unit_type == "PI" and unit.player_index == 0 and [unit.x, unit.y] == [13, 0] for unit in units))
+        units[0].health = 1
+        self.assertEqual(15, fork.game_map[13, 0][0].health, "The stack of a fork should not change")
+        fork.game_map.remove_unit([13, 0])
+        self.assertEqual([], fork.game_map[13, 0])
+
+        with mock.patch("gamelib.game_state.send_command") as send_command:
+            game.submit_turn()
+        self.assertEqual(json.loads(send_command.call_args[0][1]), [["PI", 13, 0]] * 5, "The entry should be sent as one deploy per unit")
+
+    def test_unit_stacks(self):
+        game_map = self.make_turn_0_map().game_map
+        game_map.add_unit("PI", [13, 0], 0, 20)
+        game_map.add_unit("PI", [13, 0], 0, 10)
+        game_map.add_unit("PI", [13, 0], 0, 2, 5)
+        game_map.add_unit("EI", [13, 0], 1)
+        self.assertEqual([("PI", 0, 30, 15), ("PI", 0, 2, 5), ("EI", 1, 1, 5)], game_map.get_stacks([13, 0]), "Identical units share a stack")
+        game_map.add_unit("PI", [14, 0], 0, 3, 0)
+        self.assertEqual([("PI", 0, 3, 0)], game_map.get_stacks([14, 0]), "A health of 0 is not full health")
+        self.assertEqual(32, game_map.count_units([13, 0], "PI"))
+        self.assertEqual(1, game_map.count_units([13, 0], player_index=1))
+        self.assertEqual(25, game_map.remove_units([13, 0], "PI", 0, 25))
+        self.assertEqual([("PI", 0, 5, 15), ("PI", 0, 2, 5), ("EI", 1, 1, 5)], game_map.get_stacks([13, 0]))
+
+        fork = game_map.fork()
+        fork.remove_units([13, 0], "PI")
+        self.assertEqual(1, fork.count_units([13, 0]))
+        self.assertEqual(8, game_map.count_units([13, 0]), "The stacks of a fork should not change")
+        units = game_map[13, 0]
+        self.assertEqual([("PI", 0, 5, 15), ("PI", 0, 2, 5), ("EI", 1, 1, 5)], game_map.get_stacks([13, 0]),
+                         "Building the GameUnits of a location should not change its stacks")
+        self.assertEqual([15] * 5 + [5] * 2 + [5], [unit.health for unit in units])
+        self.assertEqual(2, game_map.remove_units([13, 0], "PI", 0, 2))
+        self.assertEqual(6, game_map.count_units([13, 0]))
+        self.assertEqual(1, len(fork[13, 0]))
+
+    def test_unit_stacks_after_access(self):
+        game_map = self.make_turn_0_map().game_map
+        game_map.add_unit("PI", [13, 0], 0, 4)
+        game_map.add_unit("EI", [13, 0], 1, 2)
+        stacks = game_map.get_stacks([13, 0])
+        game_map[13, 0]
+        self.assertEqual(stacks, game_map.get_stacks([13, 0]), "Reading the location should not change its stacks")
+        game_map.add_unit("PI", [13, 0], 0, 3)
+        self.assertEqual([("PI", 0, 7, 15), ("EI", 1, 2, 5)], game_map.get_stacks([13, 0]))
+        self.assertEqual(7, game_map.count_units([13, 0], "PI"))
+        self.assertEqual(5, game_map.remove_units([13, 0], "PI", 0, 5))
+        self.assertEqual([("PI", 0, 2, 15), ("EI", 1, 2, 5)], game_map.get_stacks([13, 0]))
+        self.assertEqual(2, game_map.count_units([13, 0], "PI"))
+        game_map.add_unit("FF", [13, 2], 0)
+        self.assertEqual([], game_map.get_stacks([13, 2]), "A structure is not a stack")
+
+    def test_full_sim_ignores_friendly_structures(self):
+        import importlib.util
+        import os
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "algo3-2.py")
+        spec = importlib.util.spec_from_file_location("algo3_2", path)
+        module = importlib.util.module_from_spec(spec)
+        game = self.make_turn_0_map()
+        game.suppress_warnings(True)
+        game.game_map.add_unit("FF", [13, 2], 0)
+
+        targets = []
+        get_target = GameState.get_target
+        def record_target(state, attacking_unit):
+            target = get_target(state, attacking_unit)
+            targets.append(target)
+            return target
+        with mock.patch.object(GameState, "get_target", record_target), mock.patch("gamelib.debug_write"):
+            spec.loader.exec_module(module)
+            strategy = module.AlgoStrategy()
+            strategy.on_game_start(game.config)
+            strategy.full_sim(game, 5)
+        self.assertTrue(targets, "The scouts should look for targets along their paths")
+        self.assertEqual([], [target for target in targets if target is not None], "There are no enemy units to target")
+        self.assertEqual(["FF"], [unit.unit_type for unit in game.game_map[13, 2]], "full_sim should work on forks of the state")
+
+    def test_can_spawn_many(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        game_map.add_unit("FF", [0, 13], 0)
+        candidates = [[0, 13], [1, 12], [13, 5], [14, 0], [14, 14], [-1, 0]]
+        expected = [location for location in candidates if game.can_spawn("SI", location)]
+        self.assertEqual([[1, 12], [14, 0]], expected)
+        self.assertEqual(expected, game.can_spawn_many("SI", candidates))
+        self.assertEqual([[13, 5]], game.can_spawn_many("DF", [[0, 13], [13, 5], [14, 14]]), "Structures cannot be stacked or built on the enemy side")
+        self.assertEqual([], game.can_spawn_many("SI", [[13, 0]], 100), "We cannot afford 100 units")
+        self.assertIn((13, 0), game_map.get_edge_set(game_map.BOTTOM_LEFT))
+        self.assertNotIn((14, 0), game_map.get_edge_set(game_map.BOTTOM_LEFT))
+        self.assertEqual(game_map.location_bits(game_map.get_edge_locations(game_map.TOP_RIGHT)), game_map.get_edge_bits(game_map.TOP_RIGHT))
+        self.assertEqual([[13, 27], [12, 26]], game_map.get_edges()[game_map.TOP_LEFT][:2])
+
     def test_trivial_functions(self):
         game = self.make_turn_0_map()
 
@@ -256,6 +372,471 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def test_find_path_to_edge(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([13, 0], path[0], "Path should start at the unit")
+        self.assertIn(path[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "Path should end on the top right edge")
+        game.game_map.add_unit("FF", [13, 1], 0)
+        game.game_map.add_unit("FF", [14, 1], 0)
+        blocked_path = game.find_path_to_edge([13, 0])
+        self.assertNotIn([13, 1], blocked_path, "Path should not go through walls")
+        self.assertEqual(blocked_path, game.find_path_to_edge([13, 0]), "Repeated searches should give the same path")
+
+    def test_find_paths_to_edge(self):
+        game = self.make_turn_0_map()
+        for x in range(9, 19):
+            game.game_map.add_unit("FF", [x, 15], 1)
+        game.game_map.add_unit("FF", [13, 0], 0)
+        starts = [[13, 0], [14, 0], [3, 10], [20, 6], [13, 13]]
+        expected = [game.find_path_to_edge(start) for start in starts]
+        self.assertEqual(expected, game.find_paths_to_edge(starts), "Batched paths should match single paths")
+        self.assertIsNone(game.find_paths_to_edge(starts)[0], "A blocked start should not have a path")
+
+    def test_dynamic_pathing(self):
+        game = self.make_turn_0_map()
+        fresh = self.make_turn_0_map()
+        for x in range(6, 22):
+            game.game_map.add_unit("FF", [x, 12], 0)
+            fresh.game_map.add_unit("FF", [x, 12], 0)
+        game.set_dynamic_pathing(True)
+        self.assertEqual(fresh.find_path_to_edge([13, 0]), game.find_path_to_edge([13, 0]), "Dynamic paths should match")
+        for location in [[13, 12], [7, 12]]:
+            game.game_map.remove_unit(location)
+            fresh.game_map.remove_unit(location)
+            self.assertEqual(fresh.find_path_to_edge([13, 0]), game.find_path_to_edge([13, 0]), "Path was not repaired after a removal")
+        game.game_map.add_unit("FF", [13, 12], 0)
+        fresh.game_map.add_unit("FF", [13, 12], 0)
+        self.assertEqual(fresh.find_path_to_edge([13, 0]), game.find_path_to_edge([13, 0]), "Path was not repaired after an addition")
+
+    def test_path_cache(self):
+        game = self.make_turn_0_map()
+        game.path_cache.clear()
+        first = game.find_path_to_edge([13, 0])
+        self.assertEqual((0, 1), (game.path_cache.hits, game.path_cache.misses), "First search should miss")
+        first.append([0, 0])
+        second = self.make_turn_0_map().find_path_to_edge([13, 0])
+        self.assertEqual(1, game.path_cache.hits, "Same layout should hit the cache")
+        self.assertEqual(first[:-1], second, "Cached paths should not be changed by callers")
+        game.game_map.add_unit("FF", [13, 1], 0)
+        game.find_path_to_edge([13, 0])
+        self.assertEqual(2, game.path_cache.misses, "New layout should miss")
+
+    def test_zobrist_hash(self):
+        game = self.make_turn_0_map()
+        other = self.make_turn_0_map()
+        self.assertEqual(0, game.game_map.zobrist_hash, "An empty map should hash to 0")
+        game.game_map.add_unit("FF", [13, 5], 0)
+        game.game_map.add_unit("DF", [14, 20], 1)
+        other.game_map.add_unit("DF", [14, 20], 1)
+        other.game_map.add_unit("EF", [13, 5], 0)
+        self.assertNotEqual(game.game_map.zobrist_hash, other.game_map.zobrist_hash, "Different unit types should hash differently")
+        other.game_map.add_unit("FF", [13, 5], 0)
+        other.game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(game.game_map.zobrist_hash, other.game_map.zobrist_hash, "Same structures should hash the same")
+        game.game_map[13, 5][0].upgrade()
+        self.assertNotEqual(game.game_map.zobrist_hash, other.game_map.zobrist_hash, "Upgrades should change the hash")
+        game.game_map.remove_unit([13, 5])
+        game.game_map.remove_unit([14, 20])
+        self.assertEqual(0, game.game_map.zobrist_hash, "Removing every structure should hash to 0")
+
+    def test_fork(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 5], 0)
+        game.game_map.add_unit("FF", [14, 5], 0)
+        fork = game.fork()
+        fork.game_map[13, 5][0].health = 1
+        fork.game_map.remove_unit([14, 5])
+        fork.game_map.add_unit("PI", [13, 0], 0)
+        fork.attempt_spawn("FF", [[10, 5]])
+        self.assertEqual(90, game.game_map[13, 5][0].health, "Forked units should be copies")
+        self.assertEqual(1, len(game.game_map[14, 5]), "Removing from a fork should not change the original")
+        self.assertEqual(0, len(game.game_map[13, 0]), "Adding to a fork should not change the original")
+        self.assertEqual([], game._build_stack, "Forks should have their own build stack")
+        self.assertEqual(25, game.get_resource(game.SP), "Forks should have their own resources")
+        game.game_map[13, 5][0].upgrade()
+        self.assertFalse(fork.game_map[13, 5][0].upgraded, "Changing the original should not change the fork")
+        self.assertNotEqual(game.game_map.zobrist_hash, fork.game_map.zobrist_hash, "Forks should have their own hash")
+
+    def test_threat_map(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("DF", [16, 16], 1)
+        game.game_map.add_unit("FF", [12, 15], 1)
+        game.game_map.add_unit("DF", [13, 12], 0)
+        fork = game.fork()
+        fork.game_map.remove_unit([16, 16])
+        game.game_map[13, 14][0].upgrade()
+
+        for state in (game, fork):
+            for player_index in (0, 1):
+                for location in state.game_map:
+                    # Dead attackers are given, so the damage is searched for instead of read from the threat map
+                    expected = state.get_attack_damage_at_location(location, player_index, set())
+                    got = state.threat_map.damage_at(location, player_index)
+                    self.assertEqual(expected, got, "Wrong damage at {} for player {}".format(location, player_index))
+        self.assertEqual(game.threat_map.damage_at([13, 13], 0), game.get_attack_damage_at_location([13, 13], 0))
+        self.assertEqual(2, len(game.get_attackers([14, 15], 0)))
+        self.assertEqual(1, len(game.get_attackers([14, 15], 0, {(13, 14)})), "Dead attackers should not be counted")
+        self.assertEqual([], game.get_attackers([13, 1], 0))
+        path = game.find_path_to_edge([13, 0])
+        expected = sum(game.get_attack_damage_at_location(location, 0, set()) for location in path)
+        self.assertEqual(expected, game.threat_map.path_damage(path, 0), "Path damage should be the sum of the damage along the path")
+
+    def test_path_damage_evaluator(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("DF", [5, 15], 1)
+        paths = game.find_paths_to_edge([[13, 0], [3, 10], [24, 10]])
+        evaluator = PathDamageEvaluator(game.threat_map, 0)
+        damages = evaluator.damage_along(paths)
+        self.assertEqual([len(path) for path in paths], [len(damage) for damage in damages])
+        for path, damage in zip(paths, damages):
+            self.assertEqual([game.threat_map.damage_at(location, 0) for location in path], list(damage))
+        self.assertEqual([game.threat_map.path_damage(path, 0) for path in paths], evaluator.total_damage(paths))
+        game.game_map.remove_unit([13, 14])
+        self.assertEqual([game.threat_map.path_damage(path, 0) for path in paths], evaluator.total_damage(paths), "The evaluator should follow changes to the threat map")
+        self.assertEqual([], evaluator.total_damage([]))
+
+    def test_simulator(self):
+        game = self.make_turn_0_map()
+        result = ActionPhaseSimulator(game).simulate([("PI", [13, 0], 3, 0)])
+        self.assertEqual([3, 0], result.breaches, "Every scout should reach an open edge")
+        self.assertEqual([3.0, 0], result.breach_damage)
+        self.assertEqual(len(game.find_path_to_edge([13, 0])), result.frames, "A scout should move once every frame")
+
+        for x, y in game.game_map.get_edge_locations(game.game_map.TOP_RIGHT):
+            game.game_map.add_unit("FF", [x, y], 1)
+        result = ActionPhaseSimulator(game).simulate([("PI", [13, 0], 3, 0)])
+        self.assertEqual([0, 0], result.breaches, "Scouts should not breach a walled off edge")
+        self.assertEqual([3, 0], result.self_destructs, "Scouts that cannot reach their edge should self destruct")
+        self.assertGreater(result.damage_dealt[0]["FF"], 3 * 15.0, "Scouts should shoot the walls, then self destruct")
+        self.assertEqual(14, len([1 for x, y in game.game_map.get_edge_locations(game.game_map.TOP_RIGHT) if game.game_map[x, y]]), "The original game state should not change")
+
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 3], 1)
+        result = ActionPhaseSimulator(game).simulate([("EI", [13, 0], 1, 0)])
+        self.assertEqual([1, 0], result.deaths, "The turret should destroy the EMP")
+        self.assertEqual({"EI": 5.0}, result.damage_dealt[1])
+        self.assertEqual({(13, 3)}, result.attacking_structures[1])
+
+    def test_simulator_self_destruct_hits_moved_units(self):
+        game = self.make_turn_0_map()
+        simulation = _Simulation(ActionPhaseSimulator(game), [("PI", [13, 5], 1, 0), ("PI", [13, 9], 1, 1)])
+        scout = simulation.mobile[13 * 28 + 5][0]
+        scout.path = [[13, 5]]
+        scout.steps = 5
+        enemy = simulation.mobile[13 * 28 + 9][0]
+        enemy.path = [[13, 9], [13, 6]]
+        health = enemy.health
+        simulation.move()
+        self.assertEqual([1, 0], simulation.result.self_destructs)
+        self.assertEqual(0, enemy.health, "The blast should hit the enemy scout where it moved to this frame")
+        self.assertEqual({"PI": health}, simulation.result.damage_dealt[0])
+
+    def test_snapshot(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("FF", [13, 5], 0)
+        game.game_map[13, 14][0].upgrade()
+        game.game_map[13, 5][0].pending_removal = True
+        game.game_map[13, 5][0].health = 10.0
+        snapshot = game.snapshot()
+        rebuilt = GameState.from_snapshot(game.config, snapshot)
+        self.assertEqual(snapshot, rebuilt.snapshot(), "A game state rebuilt from a snapshot should have the same snapshot")
+        self.assertTrue(rebuilt.game_map[13, 14][0].upgraded)
+        self.assertTrue(rebuilt.game_map[13, 5][0].pending_removal)
+        self.assertEqual(10.0, rebuilt.game_map[13, 5][0].health)
+        self.assertEqual(25, rebuilt.get_resource(rebuilt.SP))
+
+    def test_evaluation_pool(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 3], 1)
+        candidates = [[("PI", [13, 0], 1, 0)], [("EI", [13, 0], 1, 0)], [("PI", [14, 0], 2, 0)]]
+        pool = EvaluationPool(2)
+        serial = pool.evaluate(game, candidates)
+        self.assertEqual([None] * 3, pool.evaluate(game, candidates, timeout=0), "Nothing should be simulated after the deadline")
+        pool.start(game.config)
+        try:
+            parallel = pool.evaluate(game, candidates)
+        finally:
+            pool.close()
+        for serial_result, parallel_result in zip(serial, parallel):
+            self.assertEqual(serial_result.breaches, parallel_result.breaches)
+            self.assertEqual(serial_result.damage_dealt, parallel_result.damage_dealt)
+
+    def test_turn_budget(self):
+        game = self.make_turn_0_map()
+        budget = TurnBudget(safety_margin=0.5)
+        budget.configure(game.config)
+        self.assertEqual(5.0, budget.limit, "The limit should be read from waitTimeBotSoft")
+        self.assertEqual(4.5, budget.remaining(), "A budget that was not started should have all its time left")
+        budget.start(budget.started_at)
+        self.assertLessEqual(budget.remaining(), 4.5)
+        self.assertFalse(budget.expired())
+        budget.start(0)
+        self.assertEqual(0, budget.remaining(), "A turn that started long ago should have no time left")
+        self.assertTrue(budget.expired())
+
+    def test_unit_stats(self):
+        game = self.make_turn_0_map()
+        turret = GameUnit("DF", game.config, 0, None, 3, 4)
+        other = GameUnit("DF", game.config, 1)
+        self.assertFalse(hasattr(turret, "__dict__"), "Units should not carry a __dict__")
+        self.assertIs(turret._stats, other._stats, "Units of the same type should share their stats")
+        self.assertEqual((90.0, 2.5, 5.0, [2.0, 0]), (turret.health, turret.attackRange, turret.damage_i, turret.cost))
+        self.assertIs(game.config, turret.config)
+        turret.upgrade()
+        self.assertEqual((3.5, 15.0, [6.0, 0]), (turret.attackRange, turret.damage_i, turret.cost), "Upgrading should switch to the upgraded stats")
+        self.assertEqual(2.5, other.attackRange, "Upgrading a unit should not change other units")
+        copied = copy.copy(turret)
+        copied.health = 1
+        self.assertEqual(90.0, turret.health)
+        self.assertTrue(copied.upgraded)
+
+    def test_unit_catalog(self):
+        game = self.make_turn_0_map()
+        catalog = UnitCatalog.for_config(game.config)
+        self.assertIs(catalog, game.unit_catalog, "The catalog should only be built once per config")
+        self.assertEqual(("FF", "EF", "DF", "PI", "EI", "SI", "RM", "UP"), catalog.unit_types)
+        self.assertEqual(2, catalog.index("DF"))
+        self.assertEqual(4.5, catalog.max_attack_range)
+        self.assertEqual((4.0, 0), catalog.stats("DF").upgrade_cost)
+        self.assertEqual((6.0, 0), catalog.stats("DF", True).cost)
+        self.assertEqual([4.0, 0], game.type_cost("DF", True))
+        self.assertEqual([1.0, 0], game.type_cost("FF", True), "Upgrades without a cost should cost as much as the unit")
+        self.assertEqual(1.0, catalog.stats("PI").breach_damage)
+        self.assertEqual(5, catalog.stats("PI").self_destruct_steps)
+
+    def test_unit_columns(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("FF", [13, 5], 0)
+        game.game_map.add_unit("PI", [12, 5], 0)
+        game.game_map.add_unit("PI", [12, 5], 0)
+        game.game_map[13, 14][0].upgrade()
+        game.game_map[13, 5][0].pending_removal = True
+        parsed = GameState.from_snapshot(game.config, game.snapshot())
+        columns = UnitColumns.from_frame(game.unit_catalog, parsed.serialized_string)
+        self.assertEqual(4, len(columns))
+        self.assertEqual((1, 2), columns.tiles[12 * 28 + 5], "Both scouts should be on the same location")
+        self.assertEqual(["DF", 1], [columns.unit_type(columns.structures[13 * 28 + 14]), columns.owners[columns.structures[13 * 28 + 14]]])
+
+        self.assertEqual(game.game_map.zobrist_hash, parsed.game_map.zobrist_hash, "Parsed structures should be hashed before they are built")
+        stats, player_index, _ = parsed.game_map._structure_at(13, 14)
+        self.assertEqual((15.0, 3.5, 1), (stats.damage_i, stats.attackRange, player_index), "The structure should be upgraded")
+        self.assertIsNone(parsed.game_map._structure_at(12, 5))
+        self.assertEqual(game.threat_map.damage_at([13, 11]), parsed.threat_map.damage_at([13, 11]))
+        simulator = ActionPhaseSimulator(parsed)
+        self.assertEqual([90], [structure.health for structure in simulator._structures if (structure.x, structure.y) == (13, 14)])
+        self.assertIs(tuple, type(parsed.game_map._GameMap__map[13][14]), "The simulator should not build the units of a parsed frame")
+
+        parsed.game_map.add_unit("PI", [13, 0], 0, 3)
+        snapshot = parsed.snapshot()
+        self.assertIs(tuple, type(parsed.game_map._GameMap__map[13][14]), "Taking a snapshot should not build the units of a parsed frame")
+        self.assertEqual([("PI", 0, 3, 15)], parsed.game_map.get_stacks([13, 0]), "Taking a snapshot should not expand stacks")
+        self.assertEqual(3, sum(1 for unit in snapshot[2] if unit[1:3] == (13, 0)))
+        self.assertEqual(sorted(snapshot[2]), sorted(GameState.from_snapshot(game.config, snapshot).snapshot()[2]))
+        parsed.game_map.remove_units([13, 0], "PI")
+
+        fork = parsed.fork()
+        self.assertEqual(2, len(parsed.game_map[12, 5]))
+        self.assertTrue(parsed.game_map[13, 5][0].pending_removal)
+        fork.game_map[13, 14][0].health = 1
+        self.assertEqual(90, parsed.game_map[13, 14][0].health, "A fork should build its own units")
+        parsed.game_map.remove_unit([13, 14])
+        self.assertEqual(game.game_map.zobrist_hash ^ game.game_map._zobrist_key(game.game_map[13, 14][0], True), parsed.game_map.zobrist_hash)
+        self.assertEqual(game.game_map.zobrist_hash, fork.game_map.zobrist_hash, "Changing the original should not change the fork")
+
+    def test_game_frame(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 14], 1)
+        frame_string = json.dumps(GameState.from_snapshot(game.config, game.snapshot()).serialized_string)
+        frame = GameFrame(frame_string, game.config)
+        self.assertEqual(frame_string, frame, "A frame should still be the string the engine sent")
+        self.assertIs(frame, GameFrame.of(frame))
+        self.assertEqual([0, 0, -1], frame.turn_info)
+        self.assertIs(frame.game_state, frame.game_state, "The game state should only be built once")
+        self.assertEqual("DF", frame.game_state.game_map[13, 14][0].unit_type)
+        from_data = GameState(game.config, json.loads(frame_string))
+        self.assertEqual(frame.game_state.snapshot(), from_data.snapshot(), "A decoded frame should parse like a string")
+
+    def test_action_frame_subscription(self):
+        action_frame = '{"p2Units":[[],[],[],[],[],[],[],[]],"turnInfo":[1,3,12],"events":{"damage":[[[13,0],4.0,3,"7",2]], "breach": [[[13,0],1.0,3,"7",2]]}}'
+        self.assertEqual({"turnInfo": [1, 3, 12], "events": {"breach": [[[13, 0], 1.0, 3, "7", 2]]}},
+                         GameFrame.scan(action_frame, "turnInfo", "events.breach", "events.missing"))
+        frame = GameFrame.partial(action_frame, ["events.breach"])
+        self.assertEqual(action_frame, frame)
+        self.assertEqual([1, 3, 12], frame.turn_info)
+        self.assertNotIn("damage", frame.data["events"])
+
+        class Recorder(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.frames = []
+
+            def on_action_frame(self, frame):
+                self.frames.append(frame.data)
+
+        end_frame = '{"turnInfo":[2,3,-1]}'
+        self.assertEqual((), AlgoCore().action_frame_fields, "Action frames should be skipped when they are not handled")
+        recorder = Recorder()
+        self.assertIsNone(recorder.action_frame_fields, "Handled action frames should be decoded whole by default")
+        recorder.subscribe_action_frames("events.breach")
+        with mock.patch("gamelib.algocore.get_command", side_effect=[action_frame, end_frame]), mock.patch("gamelib.algocore.debug_write"):
+            recorder.start()
+        self.assertEqual([GameFrame.partial(action_frame, ["events.breach"]).data], recorder.frames)
+        recorder.ignore_action_frames()
+        with mock.patch("gamelib.algocore.get_command", side_effect=[action_frame, end_frame]), mock.patch("gamelib.algocore.debug_write"):
+            recorder.start()
+        self.assertEqual(1, len(recorder.frames), "Ignored action frames should not be passed on")
+
+    def test_background_worker(self):
+        worker = BackgroundWorker(stop_timeout=1)
+        calls = []
+        worker.start(lambda stop_event, value: calls.append((value, stop_event.wait(5))), "warm")
+        self.assertTrue(worker.running)
+        self.assertTrue(worker.stop())
+        self.assertFalse(worker.running)
+        self.assertEqual([("warm", True)], calls, "The function should be told to stop")
+
+        release = threading.Event()
+        slow = BackgroundWorker(stop_timeout=0.01)
+        self.assertTrue(slow.start(lambda stop_event: release.wait(5)))
+        with mock.patch("gamelib.background.debug_write"):
+            self.assertFalse(slow.stop())
+            self.assertFalse(slow.start(calls.append), "A new function should not start while the old one runs")
+        self.assertEqual([("warm", True)], calls)
+        release.set()
+        slow.stop_timeout = 1
+        self.assertTrue(slow.start(calls.append), "The worker should start again once the old function returned")
+        self.assertTrue(slow.stop())
+        self.assertEqual(2, len(calls))
+
+        class Precomputer(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.phases = []
+
+            def precompute(self, stop_event):
+                self.phases.append(stop_event)
+                stop_event.wait(5)
+
+        algo = Precomputer()
+        action_frame = '{"turnInfo":[1,0,1]}'
+        turn_frame = '{"p2Units":[[],[],[],[],[],[],[],[]],"turnInfo":[0,1,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0]}'
+        frames = [action_frame, action_frame, turn_frame, action_frame, '{"turnInfo":[2,1,-1]}']
+        with mock.patch("gamelib.algocore.get_command", side_effect=frames), mock.patch("gamelib.algocore.debug_write"), \
+                mock.patch("gamelib.algocore.send_command"):
+            algo.start()
+        self.assertEqual(2, len(algo.phases), "precompute should run once per action phase")
+        self.assertTrue(all(stop_event.is_set() for stop_event in algo.phases), "precompute should be stopped by the next turn")
+
+    def test_buffered_io(self):
+        with mock.patch("sys.stdin", io.TextIOWrapper(io.BytesIO(b'{"turnInfo":[0,1,-1]}\n'))):
+            self.assertEqual('{"turnInfo":[0,1,-1]}\n', util.get_command())
+
+        stderr = io.StringIO()
+        with mock.patch("sys.stderr", stderr):
+            util.flush_debug()
+            stderr.truncate(0)
+            util.debug_write("first", 1)
+            util.set_log_level(util.WARNING)
+            try:
+                self.assertFalse(util.log_enabled(util.INFO))
+                util.debug_write("hidden")
+                util.debug_write("shown", level=util.ERROR)
+            finally:
+                util.set_log_level(util.DEBUG)
+            game = self.make_turn_0_map()
+            game.game_map.add_unit("DF", [13, 0], 0)
+            game.game_map.print_map()
+            self.assertEqual("", stderr.getvalue(), "Debug output should wait for flush_debug")
+            util.flush_debug()
+        lines = stderr.getvalue().splitlines()
+        self.assertEqual(["first, 1", "shown"], lines[:2])
+        self.assertEqual(28, len(lines[2:]), "print_map should write a row per y")
+        self.assertEqual(" " * 26 + "t . " + " " * 26, lines[2])
+
+    def test_bitboards(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        game_map.add_unit("DF", [13, 14], 1)
+        game_map.add_unit("DF", [20, 16], 1)
+        game_map.add_unit("FF", [14, 14], 1)
+        game_map.add_unit("DF", [13, 5], 0)
+        game_map.add_unit("PI", [12, 5], 0)
+        self.assertEqual(4, game_map.count_bits(game_map.structure_bits), "Mobile units are not structures")
+        self.assertEqual(2, game_map.count_structures(1, "DF"))
+        self.assertEqual(3, game_map.count_structures(None, "DF"))
+        self.assertEqual(3, game_map.count_structures(1))
+        self.assertEqual(1, game_map.count_structures(1, "DF", game_map.region_bits(range(14), range(14, 28))))
+        self.assertEqual(game_map.location_bits([[13, 14], [20, 16]]), game_map.bitboard(1, "DF"))
+        self.assertEqual(420, game_map.count_bits(game_map.region_bits()), "The region of the whole arena")
+        self.assertFalse(game.contains_stationary_unit([12, 5]))
+
+        fork = game.fork()
+        fork.game_map.remove_unit([13, 14])
+        fork.game_map[14, 14] = []
+        self.assertEqual(1, fork.game_map.count_structures(1))
+        self.assertEqual(3, game_map.count_structures(1), "A fork should have its own bitboards")
+        self.assertFalse(fork.contains_stationary_unit([13, 14]))
+        parsed = GameState.from_snapshot(game.config, game.snapshot())
+        self.assertEqual(game_map.bitboard(0, "DF"), parsed.game_map.bitboard(0, "DF"), "Parsed structures should be on the bitboards")
+        self.assertEqual(game_map.structure_bits, parsed.game_map.structure_bits)
+
+    def test_arena_tables(self):
+        game_map = self.make_turn_0_map().game_map
+        self.assertTrue(game_map.in_arena_bounds([13, 0]))
+        self.assertFalse(game_map.in_arena_bounds([12, 0]))
+        self.assertFalse(game_map.in_arena_bounds([-1, 13]))
+        self.assertFalse(game_map.in_arena_bounds([28, 14]))
+        self.assertTrue(game_map.in_arena_bounds([0, 13.0]), "Floats that equal a location are in bounds")
+        self.assertTrue(game_map.in_arena_bounds([13.5, 0]), "Other floats are checked against the diamond")
+        self.assertTrue(game_map.in_arena_bounds((27, 14)))
+        self.assertEqual(420, len(game_map._arena_indices))
+        self.assertEqual((13 * 28 + 1, 14 * 28), game_map._neighbors[13 * 28], "Only in-bounds neighbors")
+        self.assertEqual((), game_map._neighbors[0])
+
+    def test_deepcopy_shares_tables(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 5], 0)
+        copied = copy.deepcopy(game)
+        for name in GameMap._SHARED_TABLES:
+            self.assertIs(getattr(game.game_map, name), getattr(copied.game_map, name), "{} should be shared".format(name))
+        copied.game_map.remove_unit([13, 5])
+        self.assertTrue(game.contains_stationary_unit([13, 5]), "The original map should not change")
+        self.assertEqual(game.game_map.in_arena_bounds([0, 13]), copied.game_map.in_arena_bounds([0, 13]))
+
+    def test_deepcopy_tracks_copied_map(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 12], 0)
+        self.assertIsNone(game._threat_map, "The threat map is only built when it is used")
+        self.assertEqual(5, game.threat_map.damage_at([13, 13], 1))
+        game.set_dynamic_pathing(True)
+        game.find_path_to_edge([13, 0])
+        copied = copy.deepcopy(game)
+        self.assertEqual(2, len(game.game_map._structure_listeners))
+        self.assertEqual(2, len(copied.game_map._structure_listeners), "The copy should track its own map")
+        copied.game_map.remove_unit([13, 12])
+        self.assertEqual(0, copied.threat_map.damage_at([13, 13], 1))
+        self.assertEqual(5, game.threat_map.damage_at([13, 13], 1), "The original threat map should not change")
+
+    def test_arena_locations(self):
+        game_map = self.make_turn_0_map().game_map
+        locations = list(game_map)
+        self.assertEqual(420, len(locations))
+        self.assertEqual([[13, 0], [14, 0], [12, 1]], locations[:3], "Locations are ordered by row then column")
+        self.assertEqual([list(location) for location in game_map.arena_locations], locations)
+        self.assertEqual(420 * 420, sum(1 for _ in game_map for _ in game_map), "Nested iteration should work")
+        self.assertEqual(210, len(game_map.get_half_locations(1)))
+        self.assertTrue(all(y >= 14 for x, y in game_map.get_half_locations(1)))
+        quadrants = [game_map.get_quadrant_locations(quadrant) for quadrant in range(4)]
+        self.assertEqual([105] * 4, [len(quadrant) for quadrant in quadrants])
+        self.assertIn((0, 13), game_map.get_quadrant_locations(game_map.BOTTOM_LEFT))
+        self.assertIn((27, 14), game_map.get_quadrant_locations(game_map.TOP_RIGHT))
+        self.assertEqual(set(game_map.arena_locations), set().union(*quadrants))
+
     def test_print_unit(self):
         game = self.make_turn_0_map()
 
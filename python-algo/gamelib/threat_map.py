@@ -0,0 +1,145 @@
+import math
+from array import array
+
+_ATTACK_OFFSETS = {}
+
+def _attack_offsets(attack_range):
+    """The (dx, dy) offsets of every location a unit with the given range can attack.
+    Computed once per range and shared by every ThreatMap.
+    """
+    offsets = _ATTACK_OFFSETS.get(attack_range)
+    if offsets is None:
+        search_radius = math.ceil(attack_range)
+        offsets = tuple((dx, dy) for dx in range(-search_radius, search_radius + 1) for dy in range(-search_radius, search_radius + 1)
+                        if math.sqrt(dx ** 2 + dy ** 2) <= attack_range)
+        _ATTACK_OFFSETS[attack_range] = offsets
+    return offsets
+
+
+class ThreatMap:
+    """Keeps track of how much damage the structures on a GameMap deal to mobile units at every location.
+
+    The damage is built once from the map, then kept up to date as structures are added, removed or upgraded,
+    so looking up the damage at a location or along a path does not search the map.
+    Only structures are counted, mobile units on the map are ignored.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map whose structures are tracked
+
+    """
+    def __init__(self, game_map):
+        """Builds the damage at every location and starts listening to the map for changes
+
+        Args:
+            game_map: The GameMap to track
+
+        """
+        self.game_map = game_map
+        size = game_map.ARENA_SIZE
+        self.__size = size
+        # __damage[player_index] is the damage a unit controlled by player_index takes from its opponent's structures
+        self.__damage = [array('d', bytes(8 * size * size)), array('d', bytes(8 * size * size))]
+        self.__sources = [None] * (size * size)
+        for x, y, stats, player_index, _ in game_map._structures():
+            if stats.damage_i > 0 and stats.attackRange > 0:
+                source = (player_index, stats.damage_i, stats.attackRange)
+                self.__spread(x, y, source, 1)
+                self.__sources[x * size + y] = source
+        game_map.add_structure_listener(self._on_structure_change)
+
+    def damage_at(self, location, player_index=0):
+        """The damage per frame a mobile unit would take from enemy structures at a location
+
+        Args:
+            location: The location of a hypothetical unit
+            player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The sum of the damage of every enemy structure that can attack the location
+
+        """
+        x, y = location
+        return self.__damage[player_index][x * self.__size + y]
+
+    def path_damage(self, path, player_index=0):
+        """The damage a mobile unit would take in total if it was attacked once at every location of a path
+
+        Args:
+            path: A list of locations, such as one returned by GameState.find_path_to_edge
+            player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The sum of the damage at every location of the path
+
+        """
+        damage = self.__damage[player_index]
+        size = self.__size
+        return sum(damage[x * size + y] for x, y in path)
+
+    def damage_field(self, player_index=0):
+        """The damage at every location, indexed by x * ARENA_SIZE + y. The returned array must not be modified.
+
+        Args:
+            player_index: The player controlling the hypothetical units
+
+        """
+        return self.__damage[player_index]
+
+    def fork(self, game_map):
+        """Makes a copy of this threat map that tracks a fork of its map, see GameMap.fork
+
+        Args:
+            game_map: The forked GameMap
+
+        Returns:
+            A new ThreatMap
+
+        """
+        forked = ThreatMap.__new__(ThreatMap)
+        forked.game_map = game_map
+        forked.__size = self.__size
+        forked.__damage = [array('d', damage) for damage in self.__damage]
+        forked.__sources = list(self.__sources)
+        game_map.add_structure_listener(forked._on_structure_change)
+        return forked
+
+    def _on_structure_change(self, location):
+        x, y = location
+        self.__update(x, y)
+
+    def __sources_at(self, x, y):
+        """The (player_index, damage, range) of the structure at a location that attacks mobile units, or None
+        """
+        structure = self.game_map._structure_at(x, y)
+        if structure is not None:
+            stats, player_index, _ = structure
+            if stats.damage_i > 0 and stats.attackRange > 0:
+                return (player_index, stats.damage_i, stats.attackRange)
+        return None
+
+    def __update(self, x, y):
+        """Replaces the damage of the structure previously recorded at a location with the one there now
+        """
+        index = x * self.__size + y
+        old_source = self.__sources[index]
+        new_source = self.__sources_at(x, y)
+        if old_source == new_source:
+            return
+        if old_source is not None:
+            self.__spread(x, y, old_source, -1)
+        if new_source is not None:
+            self.__spread(x, y, new_source, 1)
+        self.__sources[index] = new_source
+
+    def __spread(self, x, y, source, sign):
+        player_index, damage, attack_range = source
+        # The structure threatens units controlled by the other player
+        field = self.__damage[1 - player_index]
+        size = self.__size
+        mask = self.game_map._arena_mask
+        amount = sign * damage
+        for dx, dy in _attack_offsets(attack_range):
+            i = x + dx
+            j = y + dy
+            if 0 <= i < size and 0 <= j < size and mask[i * size + j]:
+                field[i * size + j] += amount
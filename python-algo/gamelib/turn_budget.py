@@ -0,0 +1,66 @@
+import time
+
+
+class TurnBudget:
+    """Keeps track of how much of the time allowed for a turn has been used.
+
+    AlgoCore starts the budget as soon as it receives a turn frame, so the time spent parsing the frame is counted.
+    The limit is read from the game config: going over the soft time limit costs health, so that is what is budgeted.
+    Search routines can check remaining() or expired() to stop early and return the best answer found so far.
+
+    Attributes :
+        * limit (float): The number of seconds allowed per turn
+        * safety_margin (float): Seconds kept in reserve for submitting the turn, not counted as remaining
+        * started_at (float): The time.time() at which the current turn started, or None before the first turn
+
+    """
+    DEFAULT_LIMIT = 5.0
+
+    def __init__(self, limit=None, safety_margin=0.25):
+        self.limit = self.DEFAULT_LIMIT if limit is None else limit
+        self.safety_margin = safety_margin
+        self.started_at = None
+
+    def configure(self, config):
+        """Reads the turn time limit from the game config
+
+        Args:
+            config: The game configuration, as passed to on_game_start
+
+        """
+        timing = config.get("timingAndReplay", {})
+        if "waitTimeBotSoft" in timing:
+            self.limit = timing["waitTimeBotSoft"] / 1000
+
+    def start(self, started_at=None):
+        """Starts timing a turn
+
+        Args:
+            started_at: The time.time() at which the turn started, now if None
+
+        """
+        self.started_at = time.time() if started_at is None else started_at
+
+    def elapsed(self):
+        """The number of seconds since the turn started, 0 if no turn was started
+        """
+        return 0 if self.started_at is None else time.time() - self.started_at
+
+    def remaining(self):
+        """The number of seconds left this turn, not counting the safety margin. Never negative.
+        """
+        return max(self.limit - self.safety_margin - self.elapsed(), 0)
+
+    def expired(self):
+        """Whether there is no time left this turn
+        """
+        return self.remaining() <= 0
+
+    def deadline(self, share=1):
+        """The time.time() by which a task should be done
+
+        Args:
+            share: The share of the remaining time the task may use
+
+        """
+        return time.time() + self.remaining() * share
@@ -1,3 +1,7 @@
+import copy
+
+from .unit_catalog import UnitCatalog
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -12,6 +16,9 @@ def is_stationary(unit_type, structure_types):
 class GameUnit:
     """Holds information about a Unit. 
 
+    The stats of a unit are read from the UnitCatalog of the config. They are shared by every unit of the same type
+    and upgrade level, and cannot be changed on a single unit.
+
     Attributes :
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -32,49 +39,53 @@ class GameUnit:
         * upgraded (boolean): If this unit is upgraded
 
     """
+    __slots__ = ("unit_type", "player_index", "pending_removal", "upgraded", "x", "y", "health", "_game_map", "_stats", "_catalog")
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
         """
         self.unit_type = unit_type
-        self.config = config
         self.player_index = player_index
         self.pending_removal = False
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
+        self._game_map = None
+        self._catalog = UnitCatalog.for_config(config)
+        self._stats = self._catalog.stats(unit_type)
         self.health = self.max_health if not health else health
 
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
-
+    config = property(lambda self: self._catalog.config)
+    stationary = property(lambda self: self._stats.stationary)
+    speed = property(lambda self: self._stats.speed)
+    damage_f = property(lambda self: self._stats.damage_f)
+    damage_i = property(lambda self: self._stats.damage_i)
+    attackRange = property(lambda self: self._stats.attackRange)
+    shieldRange = property(lambda self: self._stats.shieldRange)
+    max_health = property(lambda self: self._stats.max_health)
+    shieldPerUnit = property(lambda self: self._stats.shieldPerUnit)
+    shieldBonusPerY = property(lambda self: self._stats.shieldBonusPerY)
+    cost = property(lambda self: list(self._stats.cost))
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
+        was_upgraded = self.upgraded
+        self._stats = self._catalog.stats(self.unit_type, True)
         self.upgraded = True
+        if not was_upgraded and self._game_map is not None:
+            self._game_map._structure_upgraded(self)
+
+    def __copy__(self):
+        unit = GameUnit.__new__(GameUnit)
+        for name in GameUnit.__slots__:
+            setattr(unit, name, getattr(self, name))
+        return unit
 
+    def __deepcopy__(self, memo):
+        # The stats are immutable and shared, only the map this unit is on is copied
+        unit = self.__copy__()
+        unit._game_map = copy.deepcopy(self._game_map, memo)
+        return unit
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+UnitStats = namedtuple("UnitStats", ["unit_type", "index", "stationary", "speed", "damage_f", "damage_i", "attackRange", "shieldRange",
+                                     "max_health", "shieldPerUnit", "shieldBonusPerY", "cost", "upgrade_cost", "upgradable",
+                                     "breach_damage", "self_destruct_damage_f", "self_destruct_damage_i", "self_destruct_range",
+                                     "self_destruct_steps"])
+UnitStats.__doc__ = """The stats of a unit type at one upgrade level. Costs are (SP, MP) tuples:
+cost is what a unit at this level cost in total, upgrade_cost is what upgrading a base unit costs."""
+
+# id(config) -> UnitCatalog
+_CATALOGS = {}
+
+
+class UnitCatalog:
+    """The stats of every unit type in a game config, read from the config once.
+
+    Use UnitCatalog.for_config to get the catalog of a config, it is only built the first time.
+    AlgoCore builds it in on_game_start, and GameState and GameUnit read their stats from it.
+
+    Attributes :
+        * config (JSON): The game configuration the stats were read from
+        * unit_types (tuple): The shorthand of every unit type, in the order of the config
+        * max_attack_range (float): The longest attack range of any unit, upgraded or not
+
+    """
+    def __init__(self, config):
+        self.config = config
+        self.__index = {}
+        self.__stats = {}
+        for index, type_config in enumerate(config["unitInformation"]):
+            if "shorthand" not in type_config:
+                continue
+            unit_type = type_config["shorthand"]
+            upgrade = type_config.get("upgrade", {})
+            cost = (type_config.get("cost1", 0), type_config.get("cost2", 0))
+            base = UnitStats(
+                unit_type,
+                index,
+                type_config.get("unitCategory") == 0,
+                type_config.get("speed", 0),
+                type_config.get("attackDamageTower", 0),
+                type_config.get("attackDamageWalker", 0),
+                type_config.get("attackRange", 0),
+                type_config.get("shieldRange", 0),
+                type_config.get("startHealth", 0),
+                type_config.get("shieldPerUnit", 0),
+                type_config.get("shieldBonusPerY", 0),
+                cost,
+                (upgrade.get("cost1", cost[0]), upgrade.get("cost2", cost[1])),
+                "upgrade" in type_config,
+                type_config.get("playerBreachDamage", 0),
+                type_config.get("selfDestructDamageTower", 0),
+                type_config.get("selfDestructDamageWalker", 0),
+                type_config.get("selfDestructRange", 0),
+                type_config.get("selfDestructStepsRequired", 0))
+            upgraded = base._replace(
+                speed=upgrade.get("speed", base.speed),
+                damage_f=upgrade.get("attackDamageTower", base.damage_f),
+                damage_i=upgrade.get("attackDamageWalker", base.damage_i),
+                attackRange=upgrade.get("attackRange", base.attackRange),
+                shieldRange=upgrade.get("shieldRange", base.shieldRange),
+                max_health=upgrade.get("startHealth", base.max_health),
+                shieldPerUnit=upgrade.get("shieldPerUnit", base.shieldPerUnit),
+                shieldBonusPerY=upgrade.get("shieldBonusPerY", base.shieldBonusPerY),
+                cost=(upgrade.get("cost1", 0) + cost[0], upgrade.get("cost2", 0) + cost[1]))
+            self.__index[unit_type] = index
+            self.__stats[unit_type] = (base, upgraded)
+        self.unit_types = tuple(self.__index)
+        self.max_attack_range = max([stats.attackRange for levels in self.__stats.values() for stats in levels] + [0])
+
+    @classmethod
+    def for_config(cls, config):
+        """Gets the catalog of a config, building it the first time
+
+        Args:
+            config: The game configuration
+
+        Returns:
+            The UnitCatalog of the config
+
+        """
+        catalog = _CATALOGS.get(id(config))
+        if catalog is None or catalog.config is not config:
+            catalog = cls(config)
+            _CATALOGS[id(config)] = catalog
+        return catalog
+
+    def stats(self, unit_type, upgraded=False):
+        """Gets the stats of a unit type
+
+        Args:
+            unit_type: A unit type, SCOUT, WALL, etc.
+            upgraded: True for the stats of an upgraded unit
+
+        Returns:
+            A UnitStats tuple
+
+        """
+        return self.__stats[unit_type][1 if upgraded else 0]
+
+    def index(self, unit_type):
+        """Gets the position of a unit type in the config, the index used in frames from the engine
+        """
+        return self.__index[unit_type]
+
+    def __contains__(self, unit_type):
+        return unit_type in self.__stats
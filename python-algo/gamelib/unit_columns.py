@@ -0,0 +1,138 @@
+from array import array
+
+from .unit import GameUnit
+
+# Bits of UnitColumns.flags
+PENDING_REMOVAL = 1
+UPGRADED = 2
+
+
+class UnitColumns:
+    """The units of a frame, decoded into one array per field instead of one GameUnit per unit.
+
+    Row i of every array describes the same unit. GameState decodes p1Units and p2Units into columns and
+    hands them to its GameMap, which only builds GameUnits for a location the first time it is accessed.
+    Removal and upgrade entries of the frame are folded into the flags of the structure they refer to.
+
+    Attributes :
+        * catalog (:obj: UnitCatalog): The stats of every unit type
+        * types (array): The config index of each unit's type, the same index the frame lists units by
+        * xs (array): The x coordinate of each unit
+        * ys (array): The y coordinate of each unit
+        * health (array): The health of each unit
+        * owners (array): The player controlling each unit, 0 for you 1 for the enemy
+        * flags (array): PENDING_REMOVAL and UPGRADED bits of each unit
+        * tiles (dict): Maps x * ARENA_SIZE + y to a tuple of the rows of the units at that location
+        * structures (dict): Maps x * ARENA_SIZE + y to the row of the structure at that location
+
+    """
+    def __init__(self, catalog, arena_size=28):
+        self.catalog = catalog
+        self.types = array('B')
+        self.xs = array('B')
+        self.ys = array('B')
+        self.health = array('d')
+        self.owners = array('B')
+        self.flags = array('B')
+        self.tiles = {}
+        self.structures = {}
+        self.__size = arena_size
+        type_configs = catalog.config["unitInformation"]
+        self.__unit_types = tuple(type_config.get("shorthand") for type_config in type_configs)
+        self.__stationary = tuple(unit_type in catalog and catalog.stats(unit_type).stationary for unit_type in self.__unit_types)
+        self.__remove_index, self.__upgrade_index = self.action_indices(catalog.config)
+
+    @staticmethod
+    def action_indices(config):
+        """The positions of the removal and upgrade lists in a frame, which are the last two unit types of the config
+
+        Args:
+            config: The game configuration
+
+        Returns:
+            A (remove_index, upgrade_index) tuple
+
+        """
+        count = len(config["unitInformation"])
+        return count - 2, count - 1
+
+    @classmethod
+    def from_frame(cls, catalog, state, arena_size=28):
+        """Decodes the units of both players
+
+        Args:
+            catalog: The UnitCatalog of the game config
+            state: A frame from the engine, already decoded from JSON
+            arena_size: The size of the arena
+
+        Returns:
+            A new UnitColumns
+
+        """
+        columns = cls(catalog, arena_size)
+        columns.add_units(state["p1Units"], 0)
+        columns.add_units(state["p2Units"], 1)
+        return columns
+
+    def add_units(self, units, player_index):
+        """Decodes the unit lists of one player, as found in p1Units or p2Units
+
+        Args:
+            units: One list of [x, y, health, id] entries per unit type
+            player_index: The player controlling the units
+
+        """
+        size = self.__size
+        tiles = self.tiles
+        structures = self.structures
+        types, xs, ys, health, owners, flags = self.types, self.xs, self.ys, self.health, self.owners, self.flags
+        remove_index, upgrade_index = self.__remove_index, self.__upgrade_index
+        for type_index, entries in enumerate(units):
+            # This depends on RM and UP always being the last types to be processed
+            if type_index == remove_index or type_index == upgrade_index:
+                flag = PENDING_REMOVAL if type_index == remove_index else UPGRADED
+                for entry in entries:
+                    row = structures.get(int(entry[0]) * size + int(entry[1]))
+                    if row is not None:
+                        flags[row] |= flag
+                continue
+            stationary = self.__stationary[type_index]
+            for entry in entries:
+                x = int(entry[0])
+                y = int(entry[1])
+                index = x * size + y
+                row = len(types)
+                types.append(type_index)
+                xs.append(x)
+                ys.append(y)
+                health.append(float(entry[2]))
+                owners.append(player_index)
+                flags.append(0)
+                rows = tiles.get(index)
+                tiles[index] = (row,) if rows is None else rows + (row,)
+                if stationary:
+                    structures[index] = row
+
+    def __len__(self):
+        return len(self.types)
+
+    def unit_type(self, row):
+        """The shorthand of the type of a unit
+        """
+        return self.__unit_types[self.types[row]]
+
+    def stats(self, row):
+        """The UnitStats of a unit, at its upgrade level
+        """
+        return self.catalog.stats(self.__unit_types[self.types[row]], bool(self.flags[row] & UPGRADED))
+
+    def unit(self, row):
+        """Builds the GameUnit of a row. The unit is not placed on any map.
+        """
+        unit = GameUnit(self.unit_type(row), self.catalog.config, self.owners[row], self.health[row], self.xs[row], self.ys[row])
+        flags = self.flags[row]
+        if flags & PENDING_REMOVAL:
+            unit.pending_removal = True
+        if flags & UPGRADED:
+            unit.upgrade()
+        return unit
@@ -1,41 +1,126 @@
+import atexit
+import json
 import sys
 
+# The fastest JSON decoder installed is used to read frames from the engine
+try:
+    import orjson
+    json_loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import ujson
+        json_loads = ujson.loads
+        JSON_BACKEND = "ujson"
+    except ImportError:
+        json_loads = json.loads
+        JSON_BACKEND = "json"
+
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+# Log levels, see set_log_level
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+# Debug output is kept here until flush_debug writes it to stderr in one go
+_debug_lines = []
+_debug_size = 0
+_log_level = DEBUG
+# Debug output is written as soon as this many characters are waiting
+DEBUG_BUFFER_SIZE = 1 << 16
+
 
 def get_command():
     """Gets input from stdin
 
     """
+    # Reading the raw bytes skips the line by line decoding of the text wrapper, frames can be large
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
     try:
-        ret = sys.stdin.readline()
+        ret = stdin.readline()
     except EOFError:
         # Game parent process terminated so exit
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
-    if ret == "":
+    if not ret:
         # Happens if parent game process dies, so exit for cleanup, 
         # Don't change or starter-algo process won't exit even though the game has closed
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
-    return ret
+    return ret.decode() if isinstance(ret, bytes) else ret
 
-def send_command(cmd):
+def send_command(*cmds):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'
 
+    Args:
+        cmds: The commands to send, one per line. They are written and flushed together.
+
     """
-    sys.stdout.write(cmd.strip() + "\n")
+    sys.stdout.write("".join(cmd.strip() + "\n" for cmd in cmds))
     sys.stdout.flush()
 
-def debug_write(*msg):
+def set_log_level(level):
+    """Sets the lowest level of the messages written by debug_write, DEBUG to write everything
+
+    Args:
+        level: DEBUG, INFO, WARNING or ERROR
+
+    """
+    global _log_level
+    _log_level = level
+
+def log_enabled(level):
+    """Whether messages of a level are written, to skip building messages that would be thrown away
+    """
+    return level >= _log_level
+
+def debug_write(*msg, level=INFO):
     """Prints a message to the games debug output
 
+    The message is buffered and written at the end of the turn, see flush_debug.
+    Nothing is formatted if the level is below the log level, see set_log_level.
+
     Args:
         msg: The message to output
+        level: The level of the message
 
     """
+    if level < _log_level:
+        return
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
-    sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
+    debug_write_raw(", ".join(map(str, msg)).strip() + "\n", level)
+
+def debug_write_raw(text, level=INFO):
+    """Prints text to the games debug output as it is, without adding a new line
+
+    Args:
+        text: The text to output
+        level: The level of the text
+
+    """
+    global _debug_size
+    if level < _log_level:
+        return
+    _debug_lines.append(text)
+    _debug_size += len(text)
+    if _debug_size >= DEBUG_BUFFER_SIZE:
+        flush_debug()
+
+def flush_debug():
+    """Writes the buffered debug output to stderr. AlgoCore calls it after each frame it handles and at exit.
+    """
+    global _debug_size
+    if not _debug_lines:
+        return
+    # Lines added by another thread while writing are kept for the next flush
+    lines = _debug_lines[:]
+    del _debug_lines[:len(lines)]
+    _debug_size = 0
+    sys.stderr.write("".join(lines))
     sys.stderr.flush()
+
+atexit.register(flush_debug)